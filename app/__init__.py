@@ -18,12 +18,13 @@ except ImportError:
 db = SQLAlchemy()
 login_manager = LoginManager()
 
-try:
-    from flask_migrate import Migrate
-    migrate = Migrate()
-    MIGRATE_AVAILABLE = True
-except ImportError:
-    MIGRATE_AVAILABLE = False
+def is_serverless():
+    """Whether the process serves requests on Vercel/AWS Lambda rather than
+    running locally or under the ``flask`` CLI. Set SERVERLESS=0/1 to override."""
+    flag = os.environ.get('SERVERLESS')
+    if flag is not None:
+        return flag.lower() in ('1', 'true', 'yes')
+    return bool(os.environ.get('VERCEL') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
 
 def create_app():
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
@@ -57,23 +58,52 @@ def create_app():
         app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
-    # Performance optimizations for Vercel serverless environment
+    # Performance optimizations for Vercel serverless environment; the pool
+    # limits can be tuned per deployment (see `benchmark.py load`)
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_size': 2,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 2)),
         'pool_recycle': 300,
         'pool_pre_ping': True,
-        'max_overflow': 0,
-        'pool_timeout': 30
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 0)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30))
     }
     
     # Enable response compression for smaller payload sizes
     app.config['COMPRESS_ENABLED'] = True
     app.config['COMPRESS_MIN_SIZE'] = 500
     app.config['COMPRESS_BR_LEVEL'] = 6
+    # Streamed responses (CSV export) must not be buffered for compression
+    app.config['COMPRESS_STREAMS'] = False
+
+    # Per-process month grid cache for the hall calendar and dashboard
+    app.config['MONTH_GRID_CACHE_SIZE'] = int(os.environ.get('MONTH_GRID_CACHE_SIZE', 256))
+    app.config['MONTH_GRID_CACHE_TTL'] = int(os.environ.get('MONTH_GRID_CACHE_TTL', 60))
+    # BID counter values reserved per database round trip
+    app.config['BID_BLOCK_SIZE'] = int(os.environ.get('BID_BLOCK_SIZE', 20))
+    # Rendered receipt PDFs kept per process (0 disables the cache)
+    app.config['RECEIPT_CACHE_SIZE'] = int(os.environ.get('RECEIPT_CACHE_SIZE', 64))
+    # Worker processes (threads where processes are unavailable) for batch receipts
+    app.config['RECEIPT_WORKERS'] = int(os.environ.get('RECEIPT_WORKERS', min(os.cpu_count() or 1, 4)))
+    # Rendered calendar and booking table HTML kept per process, in bytes (0 disables the cache)
+    app.config['FRAGMENT_CACHE_BYTES'] = int(os.environ.get('FRAGMENT_CACHE_BYTES', 2 * 1024 * 1024))
+    # Seconds a user's session version is trusted before the session identity is rechecked (0 checks every request)
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+
+    # Per-view query budgets raise in debug/testing; set QUERY_BUDGET_ENFORCE=0/1 to override
+    enforce = os.environ.get('QUERY_BUDGET_ENFORCE')
+    app.config['QUERY_BUDGET_ENFORCE'] = None if enforce is None else enforce.lower() in ('1', 'true', 'yes')
+
+    # Serverless mode keeps cold starts short: Flask-Migrate (alembic) is only
+    # used by `flask db`, and forms, CSV and PDF code load on first use
+    app.config['SERVERLESS'] = is_serverless()
 
     db.init_app(app)
-    if MIGRATE_AVAILABLE:
-        migrate.init_app(app, db)
+    if not app.config['SERVERLESS']:
+        try:
+            from flask_migrate import Migrate
+            Migrate(app, db)
+        except ImportError:
+            pass
     login_manager.init_app(app)
     
     # Initialize compression for faster response delivery
@@ -82,11 +112,26 @@ def create_app():
     
     login_manager.login_view = 'auth.login'
 
-    from app.models import User
+    from app import instrumentation
+    instrumentation.init_app(app)
+
+    from app.identity import identities
+    identities.configure(app.config['IDENTITY_CACHE_TTL'])
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Identity cached in the signed session; the database is only read
+        # when its version is unknown here or out of date
+        return identities.load(int(user_id))
+
+    from app.calendar_cache import month_grids
+    month_grids.configure(app.config['MONTH_GRID_CACHE_SIZE'], app.config['MONTH_GRID_CACHE_TTL'])
+    from app.bids import allocator
+    allocator.configure(app.config['BID_BLOCK_SIZE'])
+    from app.receipts import receipts
+    receipts.configure(app.config['RECEIPT_CACHE_SIZE'], app.config['RECEIPT_WORKERS'])
+    from app.fragments import fragments
+    fragments.configure(app.config['FRAGMENT_CACHE_BYTES'])
 
     from app.routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
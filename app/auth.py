@@ -1,31 +1,17 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
+from app.instrumentation import query_budget
 from app.models import User
-from wtforms import StringField, PasswordField, SubmitField, SelectField
-from wtforms.validators import DataRequired, Length, EqualTo
-from flask_wtf import FlaskForm
 
 auth = Blueprint('auth', __name__)
 
-class LoginForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired()])
-    password = PasswordField('Password', validators=[DataRequired()])
-    submit = SubmitField('Login')
-
-class RegisterForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired(), Length(min=4, max=150)])
-    name = StringField('Full Name', validators=[DataRequired(), Length(min=2, max=150)])
-    password = PasswordField('Password', validators=[DataRequired(), Length(min=6)])
-    confirm_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password')])
-    role = SelectField('Role', choices=[('user', 'User'), ('admin', 'Admin')], default='user')
-    admin_password = PasswordField('Admin Password (required for Admin role)')
-    submit = SubmitField('Register')
-
 @auth.route('/login', methods=['GET', 'POST'])
+@query_budget(1)
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
+    from app.forms import LoginForm
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
@@ -38,9 +24,11 @@ def login():
     return render_template('login.html', form=form)
 
 @auth.route('/register', methods=['GET', 'POST'])
+@query_budget(3)
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
+    from app.forms import RegisterForm
     form = RegisterForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
@@ -61,6 +49,7 @@ def register():
     return render_template('register.html', form=form)
 
 @auth.route('/logout')
+@query_budget(1)
 @login_required
 def logout():
     logout_user()
@@ -0,0 +1,136 @@
+import threading
+from datetime import date
+
+from app import db
+from app.models import Booking
+from app.calendar_cache import month_bounds
+
+# Years held in memory: the project's first bookings through the last year
+# offered by the dashboard dropdown. Months outside are read from the database.
+FIRST_YEAR = 2025
+LAST_YEAR = 2050
+
+EPOCH = date(FIRST_YEAR, 1, 1)
+DAYS = (date(LAST_YEAR + 1, 1, 1) - EPOCH).days
+DAY, NIGHT = 1, 2  # slot bits within a hall-day
+
+
+def slot_bit(time_slot):
+    return DAY if time_slot == 'day' else NIGHT if time_slot == 'night' else 0
+
+
+def range_codes(hall_id, start_date, end_date):
+    """Slot bits for each day in [start_date, end_date] from one range scan.
+
+    The (hall_id, date) filter is served by the leading columns of
+    uq_booking_hall_date_slot.
+    """
+    codes = bytearray((end_date - start_date).days + 1)
+    rows = db.session.query(Booking.date, Booking.time_slot).filter(
+        Booking.hall_id == hall_id, Booking.date >= start_date, Booking.date <= end_date)
+    for booking_date, time_slot in rows:
+        codes[(booking_date - start_date).days] |= slot_bit(time_slot)
+    return codes
+
+
+class AvailabilityIndex:
+    """Booked/free state of every (hall, date, slot), 2 bits per hall-day.
+
+    Each hall gets a ``bytearray`` holding four days per byte, about 2.4 KB
+    for 2025-2050. A month is read from the booking table the first time it
+    is asked for and tagged with the data version it was read at; asking with
+    another version (a write to that hall and month in any process, or a
+    restore) reloads just that month. Callers pass the version their page's
+    ETag is built from, so the calendars are exactly as fresh as the ETag.
+
+    Bookings are never refused from the index: the unique slot constraint is
+    the conflict check.
+    """
+
+    def __init__(self):
+        self._halls = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _read(self, hall_id, start_date, days):
+        bits = self._halls.get(hall_id)
+        if bits is None:
+            return bytearray(days)
+        offset = (start_date - EPOCH).days
+        return bytearray(bits[o >> 2] >> ((o & 3) * 2) & 3 for o in range(offset, offset + days))
+
+    def _write(self, hall_id, start_date, codes):
+        bits = self._halls.get(hall_id)
+        if bits is None:
+            bits = self._halls[hall_id] = bytearray((DAYS + 3) // 4)
+        offset = (start_date - EPOCH).days
+        for o, code in enumerate(codes, offset):
+            shift = (o & 3) * 2
+            bits[o >> 2] = bits[o >> 2] & ~(3 << shift) & 0xFF | code << shift
+
+    def months(self, hall_ids, year, month, versions):
+        """{hall_id: slot bits for each day of the month}, loading every hall
+        not held at ``versions[hall_id]`` with one range scan."""
+        start_date, end_date = month_bounds(year, month)
+        days = (end_date - start_date).days
+        held = FIRST_YEAR <= year <= LAST_YEAR
+        found = {}
+        missing = []
+        with self._lock:
+            for hall_id in hall_ids:
+                if held and self._versions.get((hall_id, year, month)) == versions[hall_id]:
+                    found[hall_id] = self._read(hall_id, start_date, days)
+                    self.hits += 1
+                else:
+                    missing.append(hall_id)
+                    self.misses += 1
+        if missing:
+            loaded = {hall_id: bytearray(days) for hall_id in missing}
+            rows = db.session.query(Booking.hall_id, Booking.date, Booking.time_slot).filter(
+                Booking.hall_id.in_(missing), Booking.date >= start_date, Booking.date < end_date)
+            for hall_id, booking_date, time_slot in rows:
+                loaded[hall_id][(booking_date - start_date).days] |= slot_bit(time_slot)
+            if held:
+                with self._lock:
+                    for hall_id, codes in loaded.items():
+                        self._write(hall_id, start_date, codes)
+                        self._versions[(hall_id, year, month)] = versions[hall_id]
+            found.update(loaded)
+        return found
+
+    def month_codes(self, hall_id, year, month, version):
+        return self.months([hall_id], year, month, {hall_id: version})[hall_id]
+
+    def booked_dates(self, hall_ids, year, month, versions):
+        """Dates in the month booked in any of ``hall_ids``."""
+        booked = set()
+        for codes in self.months(hall_ids, year, month, versions).values():
+            booked.update(day for day, code in enumerate(codes, 1) if code)
+        return {date(year, month, day) for day in booked}
+
+    def clear(self):
+        with self._lock:
+            self._halls.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'halls': len(self._halls), 'months': len(self._versions), 'bytes': sum(len(b) for b in self._halls.values()),
+                    'first_year': FIRST_YEAR, 'last_year': LAST_YEAR, 'hits': self.hits, 'misses': self.misses}
+
+
+availability = AvailabilityIndex()
+
+
+def encode_runs(codes):
+    """Run-length encode slot bits as [[code, length], ...]."""
+    runs = []
+    for code in codes:
+        if runs and runs[-1][0] == code:
+            runs[-1][1] += 1
+        else:
+            runs.append([code, 1])
+    return runs
+
@@ -0,0 +1,113 @@
+import threading
+
+from sqlalchemy import update
+
+from app import db
+from app.models import BidSequence
+
+BID_SPACE = 10 ** 6
+SEQUENCE_NAME = 'booking'
+# Legacy BIDs were random, so a fresh counter value can still hit one
+COMMIT_ATTEMPTS = 5
+
+# 4-round Feistel network on 20 bits (two 10-bit halves); 2**20 is the
+# smallest power of two covering the six-digit space
+_HALF_BITS = 10
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUND_KEYS = (0x2B7, 0x1C9, 0x3A5, 0x0F3)
+
+
+def _feistel(value):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for key in _ROUND_KEYS:
+        left, right = right, left ^ (((right * 0x2F1 + key) ^ (right >> 3)) & _HALF_MASK)
+    return (left << _HALF_BITS) | right
+
+
+def scramble(counter):
+    """Map a counter in [0, BID_SPACE) to a distinct value in the same range.
+
+    The Feistel network permutes [0, 2**20); values that land past BID_SPACE
+    are fed through again (cycle walking) until they fall inside it, which
+    keeps the mapping one-to-one on the six-digit space.
+    """
+    if not 0 <= counter < BID_SPACE:
+        raise ValueError(f'BID counter {counter} is outside the six-digit space')
+    value = _feistel(counter)
+    while value >= BID_SPACE:
+        value = _feistel(value)
+    return value
+
+
+class BidAllocator:
+    """Hands out BIDs from a per-process block of counter values.
+
+    Blocks are reserved with one ``UPDATE ... RETURNING`` on the bid_sequence
+    row, so workers never share a counter value and no booking lookup is
+    needed. The update is committed on the session's own connection right
+    away (rather than on a second pooled one, which two requests could
+    deadlock on), so take BIDs before staging other changes. Unused values in
+    a block are lost when the process exits, which only leaves gaps in the
+    permutation.
+    """
+
+    def __init__(self, block_size=20):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._blocks = 0
+        self._lock = threading.Lock()
+
+    def configure(self, block_size):
+        with self._lock:
+            self.block_size = block_size
+
+    def _reserve(self, size):
+        table = BidSequence.__table__
+        end = db.session.execute(update(table).where(table.c.name == SEQUENCE_NAME).values(
+            next_value=table.c.next_value + size).returning(table.c.next_value)).scalar()
+        if end is None:
+            db.session.rollback()
+            raise RuntimeError('The bid_sequence table is not seeded; run the database migrations')
+        # Committed on its own so a rolled-back booking cannot hand the block out twice
+        db.session.commit()
+        return end - size, end
+
+    def next_bids(self, count):
+        """``count`` BIDs, reserving at most one new block for them."""
+        with self._lock:
+            counters = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(counters)
+            missing = count - len(counters)
+            if missing:
+                # One block covers the shortfall and refills the buffer
+                start, self._end = self._reserve(missing + self.block_size)
+                counters.extend(range(start, start + missing))
+                self._next = start + missing
+                self._blocks += 1
+        if counters and counters[-1] >= BID_SPACE:
+            raise RuntimeError('All six-digit BIDs have been allocated')
+        return [f'{scramble(counter):06d}' for counter in counters]
+
+    def next_bid(self):
+        return self.next_bids(1)[0]
+
+    def reset(self):
+        """Forget the current block, e.g. after a rollback or a restore."""
+        with self._lock:
+            self._next = self._end = 0
+
+    def stats(self):
+        with self._lock:
+            return {'block_size': self.block_size, 'blocks_reserved': self._blocks,
+                    'remaining_in_block': self._end - self._next}
+
+
+allocator = BidAllocator()
+
+
+def is_bid_conflict(exc):
+    """Whether an IntegrityError came from the unique index on bid."""
+    # SQLite: "UNIQUE constraint failed: booking.bid"; PostgreSQL: "booking_bid_key"
+    message = str(exc.orig)
+    return 'booking.bid' in message or 'booking_bid_key' in message
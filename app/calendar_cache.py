@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Booking, Hall
+
+# Plain rows so cached halls never become detached ORM instances
+HallRow = namedtuple('HallRow', ['id', 'name'])
+
+
+def month_bounds(year, month):
+    start_date = date(year, month, 1)
+    end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start_date, end_date
+
+
+class MonthGrid:
+    """Booking counters for one hall and month.
+
+    Slot occupancy lives in the availability index (app.availability); the
+    grid only keeps what the stats row and the dashboard counters need.
+    ``version`` is the data version the counts were read at, when the caller
+    knew it.
+    """
+
+    __slots__ = ('hall_id', 'year', 'month', 'version', 'total', 'confirmed', 'pending', 'day', 'night', 'loaded_at')
+
+    def __init__(self, hall_id, year, month, version=None):
+        self.hall_id = hall_id
+        self.year = year
+        self.month = month
+        self.version = version
+        self.total = self.confirmed = self.pending = self.day = self.night = 0
+        self.loaded_at = time.monotonic()
+
+    def add(self, status, time_slot, count):
+        self.total += count
+        if status == 'confirmed':
+            self.confirmed += count
+        elif status == 'pending':
+            self.pending += count
+        if time_slot == 'day':
+            self.day += count
+        elif time_slot == 'night':
+            self.night += count
+
+
+class MonthGridCache:
+    """Per-process LRU of MonthGrid objects keyed by (hall_id, year, month).
+
+    Writes invalidate the affected month explicitly; the TTL only bounds how
+    long another process's writes can stay invisible here. Callers that pass
+    the month's data version get counts read at exactly that version instead.
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._grids = OrderedDict()
+        self._halls = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, maxsize, ttl):
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._grids.clear()
+            self._halls = None
+
+    def _fresh(self, loaded_at):
+        return self.ttl is None or time.monotonic() - loaded_at < self.ttl
+
+    def halls(self):
+        with self._lock:
+            cached = self._halls
+            if cached is not None and self._fresh(cached[0]):
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        rows = [HallRow(h.id, h.name) for h in db.session.query(Hall.id, Hall.name).order_by(Hall.id)]
+        with self._lock:
+            self._halls = (time.monotonic(), rows)
+        return rows
+
+    def hall(self, hall_id):
+        return next((h for h in self.halls() if h.id == hall_id), None)
+
+    def get(self, hall_id, year, month, version=None):
+        return self.get_many([hall_id], year, month, None if version is None else {hall_id: version})[hall_id]
+
+    def get_many(self, hall_ids, year, month, versions=None):
+        """Return {hall_id: MonthGrid}, loading every miss with one query.
+
+        With ``versions`` ({hall_id: data version}) a cached grid is only used
+        if it was read at that version, whatever its age.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for hall_id in hall_ids:
+                key = (hall_id, year, month)
+                grid = self._grids.get(key)
+                if grid is not None and (grid.version == versions[hall_id] if versions
+                                         else self._fresh(grid.loaded_at)):
+                    self._grids.move_to_end(key)
+                    found[hall_id] = grid
+                    self.hits += 1
+                else:
+                    missing.append(hall_id)
+                    self.misses += 1
+        if missing:
+            start_date, end_date = month_bounds(year, month)
+            grids = {hall_id: MonthGrid(hall_id, year, month, versions and versions[hall_id]) for hall_id in missing}
+            rows = db.session.query(Booking.hall_id, Booking.status, Booking.time_slot, func.count(Booking.id)).filter(
+                Booking.hall_id.in_(missing), Booking.date >= start_date, Booking.date < end_date).group_by(
+                Booking.hall_id, Booking.status, Booking.time_slot).all()
+            for hall_id, status, time_slot, count in rows:
+                grids[hall_id].add(status, time_slot, count)
+            with self._lock:
+                for hall_id, grid in grids.items():
+                    self._grids[(hall_id, year, month)] = grid
+                    self._grids.move_to_end((hall_id, year, month))
+                while len(self._grids) > self.maxsize:
+                    self._grids.popitem(last=False)
+            found.update(grids)
+        return found
+
+    def invalidate(self, hall_id, year, month):
+        with self._lock:
+            self._grids.pop((hall_id, year, month), None)
+
+    def invalidate_booking(self, booking):
+        self.invalidate(booking.hall_id, booking.date.year, booking.date.month)
+
+    def clear(self):
+        with self._lock:
+            self._grids.clear()
+            self._halls = None
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._grids), 'maxsize': self.maxsize, 'ttl': self.ttl}
+
+
+month_grids = MonthGridCache()
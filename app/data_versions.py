@@ -0,0 +1,150 @@
+import hashlib
+from datetime import timezone
+
+from flask import Response, request, session
+from sqlalchemy import and_, event, func, inspect, or_, select, tuple_
+
+from app import db
+from app.dbaccess import dialect_insert
+from app.identity import SESSION_KEY
+from app.models import Booking, DataVersion, current_utc
+
+# Bumped by restores, which can change any month of any hall
+GLOBAL = (0, 0, 0)
+
+
+def version_key(hall_id, day):
+    return hall_id, day.year, day.month
+
+
+def touch(executor, keys):
+    """Bump the data version of each (hall_id, year, month) in ``keys`` with
+    one upsert; ``executor`` is the session or connection whose transaction
+    holds the change."""
+    if not keys:
+        return
+    table = DataVersion.__table__
+    now = current_utc()
+    rows = [{'hall_id': hall_id, 'year': year, 'month': month, 'version': 1, 'updated_at': now}
+            for hall_id, year, month in sorted(keys)]
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    stmt = dialect_insert(table, bind)
+    stmt = stmt.on_conflict_do_update(index_elements=['hall_id', 'year', 'month'],
+                                      set_={'version': table.c.version + 1, 'updated_at': stmt.excluded.updated_at})
+    executor.execute(stmt, rows)
+
+
+def _old_value(state, name):
+    history = state.attrs[name].load_history()
+    return history.deleted[0] if history.deleted else getattr(state.obj(), name)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_keys(session, flush_context, instances):
+    keys = session.info.setdefault('version_keys', set())
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            keys.add(version_key(obj.hall_id, obj.date))
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            state = inspect(obj)
+            keys.add(version_key(_old_value(state, 'hall_id'), _old_value(state, 'date')))
+    for obj in session.dirty:
+        if isinstance(obj, Booking) and session.is_modified(obj):
+            # Any column shows up on some page; a move changes two months
+            state = inspect(obj)
+            keys.add(version_key(_old_value(state, 'hall_id'), _old_value(state, 'date')))
+            keys.add(version_key(obj.hall_id, obj.date))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _touch_keys(session, flush_context):
+    keys = session.info.pop('version_keys', None)
+    if keys:
+        touch(session.connection(), keys)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_keys(session, previous_transaction):
+    session.info.pop('version_keys', None)
+
+
+def data_state(year, month, hall_id=None, since=None):
+    """(version, updated_at) over the data versions a page reads: one hall (or
+    all) in year/month, every month from the date ``since`` on, and restores.
+
+    Versions only grow, so their sum changes with any of them. One query.
+    """
+    table = DataVersion.__table__
+    scope = [and_(table.c.year == year, table.c.month == month,
+                  *([table.c.hall_id == hall_id] if hall_id is not None else []))]
+    if since is not None:
+        scope.append(tuple_(table.c.year, table.c.month) >= (since.year, since.month))
+    scope.append(tuple_(table.c.hall_id, table.c.year, table.c.month) == GLOBAL)
+    version, updated_at = db.session.execute(
+        select(func.coalesce(func.sum(table.c.version), 0), func.max(table.c.updated_at)).where(or_(*scope))).one()
+    return version, updated_at
+
+
+def hall_versions(hall_ids, year, month):
+    """{hall_id: the version data_state(year, month, hall_id) returns} for
+    many halls in one query."""
+    table = DataVersion.__table__
+    rows = db.session.execute(select(table.c.hall_id, table.c.year, table.c.version).where(or_(
+        and_(table.c.year == year, table.c.month == month, table.c.hall_id.in_(hall_ids)),
+        tuple_(table.c.hall_id, table.c.year, table.c.month) == GLOBAL)))
+    versions, restores = {}, 0
+    for hall_id, row_year, version in rows:
+        if (hall_id, row_year) == GLOBAL[:2]:
+            restores = version
+        else:
+            versions[hall_id] = version
+    return {hall_id: versions.get(hall_id, 0) + restores for hall_id in hall_ids}
+
+
+def page_validator(state, *parts):
+    """(etag, last_modified) for the current page given its ``data_state`` and
+    ``parts``, anything else it shows (such as today's date), or None when it
+    must be rendered afresh.
+
+    The ETag covers the URL and the signed-in user's id and cached identity
+    from the session, so none of them needs a query. Pages with pending flash
+    messages are not validated.
+    """
+    if '_flashes' in session:
+        return None
+    version, updated_at = state
+    identity = session.get(SESSION_KEY) or {}
+    key = repr((request.full_path, session.get('_user_id'), identity.get('version'), identity.get('role'),
+                identity.get('name'), version, parts))
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+    return etag, updated_at and updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def stamp(response, validator):
+    """Add the validator headers; browsers revalidate on every visit."""
+    response.vary.add('Cookie')
+    if validator is not None:
+        etag, last_modified = validator
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        response.cache_control.private = True
+    return response
+
+
+def not_modified(validator):
+    """The 304 response when the client's If-None-Match matches ``validator``,
+    else None.
+
+    If-Modified-Since alone never matches: the timestamp says nothing about
+    the user, day or URL the client's copy was rendered for.
+    """
+    if validator is None or not request.if_none_match:
+        return None
+    etag = validator[0]
+    # Flask-Compress sends compressed pages with ':gzip' or ':br' appended to the ETag
+    sent = {tag.split(':', 1)[0] for tag in request.if_none_match.as_set(include_weak=True)}
+    matched = request.if_none_match.star_tag or etag in sent
+    return stamp(Response(status=304), validator) if matched else None
@@ -0,0 +1,69 @@
+import os
+import time
+from contextlib import contextmanager
+from importlib import import_module
+
+from sqlalchemy import inspect
+
+from app import create_app, db
+
+# The app runs on PostgreSQL and SQLite, both of which support ON CONFLICT;
+# only the engine's own dialect module gets imported
+_DIALECT_INSERTS = {'postgresql': 'sqlalchemy.dialects.postgresql', 'sqlite': 'sqlalchemy.dialects.sqlite'}
+
+
+class AccessTimer:
+    """Seconds spent checking out a connection versus using it."""
+
+    __slots__ = ('connect', 'query')
+
+    def __init__(self):
+        self.connect = 0.0
+        self.query = 0.0
+
+    def as_dict(self):
+        return {'connect_ms': round(self.connect * 1000, 1), 'query_ms': round(self.query * 1000, 1)}
+
+    def __str__(self):
+        return f'connect {self.connect * 1000:.0f} ms, query {self.query * 1000:.0f} ms'
+
+
+def create_script_app():
+    """The app for maintenance scripts, which only use its pooled engine; a
+    secret key is needed to build it, so one is supplied if none is set."""
+    os.environ.setdefault('SECRET_KEY', 'maintenance-script')
+    return create_app()
+
+
+@contextmanager
+def connection(begin=False):
+    """Yield (conn, timer) for a connection from the app's pooled engine.
+
+    With ``begin`` the block runs in one transaction that commits on success.
+    The timer is filled in when the block exits.
+    """
+    timer = AccessTimer()
+    started = time.perf_counter()
+    conn = db.engine.connect()
+    timer.connect = time.perf_counter() - started
+    started = time.perf_counter()
+    try:
+        if begin:
+            with conn.begin():
+                yield conn, timer
+        else:
+            yield conn, timer
+    finally:
+        timer.query = time.perf_counter() - started
+        conn.close()
+
+
+def existing_tables(conn):
+    """Names of the tables in the connected database, without reflecting their columns."""
+    return set(inspect(conn).get_table_names())
+
+
+def dialect_insert(table, bind=None):
+    """INSERT for ``table`` with the dialect's ON CONFLICT clauses available."""
+    name = (bind or db.engine).dialect.name
+    return import_module(_DIALECT_INSERTS[name]).insert(table)
@@ -0,0 +1,67 @@
+import csv
+import zlib
+from datetime import timezone
+from io import StringIO
+
+from app import db
+from app.models import Booking, Hall, IST
+
+CSV_HEADER = ['BID', 'Hall', 'Date', 'Time Slot', 'Client Name', 'Phone', 'Address', 'Status', 'Booked On', 'Confirmed On', 'Advance Paid', 'Balance', 'Total']
+
+# Rows per yielded chunk and per database fetch
+CHUNK_ROWS = 500
+
+EXPORT_COLUMNS = (
+    Booking.bid, Hall.name, Booking.date, Booking.time_slot, Booking.client_name, Booking.phone, Booking.address,
+    Booking.status, Booking.created_at, Booking.confirmed_at, Booking.advance_paid, Booking.balance, Booking.total,
+)
+
+
+def _ist(value):
+    if value is None:
+        return ''
+    # Stored timestamps are naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(IST).strftime('%d %b %Y %H:%M')
+
+
+def export_query(start_date=None, end_date=None, hall_id=None, status=None):
+    """Column-only booking query for the export; no ORM objects are built."""
+    query = db.session.query(*EXPORT_COLUMNS).join(Hall, Booking.hall_id == Hall.id)
+    if start_date is not None:
+        query = query.filter(Booking.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Booking.date <= end_date)
+    if hall_id is not None:
+        query = query.filter(Booking.hall_id == hall_id)
+    if status:
+        query = query.filter(Booking.status == status)
+    return query.order_by(Booking.date, Booking.id).execution_options(stream_results=True, yield_per=CHUNK_ROWS)
+
+
+def iter_csv(query):
+    """Yield the CSV as text chunks of CHUNK_ROWS rows each."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for count, (bid, hall_name, day, time_slot, client_name, phone, address, status, created_at, confirmed_at, advance_paid, balance, total) in enumerate(query, 1):
+        writer.writerow([
+            bid, hall_name, day.strftime('%d %b %Y'), time_slot.title(), client_name, phone, address, status.title(),
+            _ist(created_at), _ist(confirmed_at), advance_paid or 0, balance or 0, total or 0,
+        ])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_gzip(chunks):
+    """Gzip text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,43 @@
+# WTForms form classes. Views import them on first use so WTForms and
+# Flask-WTF stay off the cold-start import path.
+from flask_wtf import FlaskForm
+from wtforms import StringField, PasswordField, TextAreaField, SelectField, SubmitField, FloatField, FileField
+from wtforms.validators import DataRequired, Length, EqualTo
+
+
+class LoginForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired()])
+    submit = SubmitField('Login')
+
+class RegisterForm(FlaskForm):
+    username = StringField('Username', validators=[DataRequired(), Length(min=4, max=150)])
+    name = StringField('Full Name', validators=[DataRequired(), Length(min=2, max=150)])
+    password = PasswordField('Password', validators=[DataRequired(), Length(min=6)])
+    confirm_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password')])
+    role = SelectField('Role', choices=[('user', 'User'), ('admin', 'Admin')], default='user')
+    admin_password = PasswordField('Admin Password (required for Admin role)')
+    submit = SubmitField('Register')
+
+class BookingForm(FlaskForm):
+    client_name = StringField('Client Name', validators=[DataRequired()])
+    phone = StringField('Phone Number', validators=[DataRequired()])
+    address = TextAreaField('Address', validators=[DataRequired()])
+    time_slot = SelectField('Time Slot', choices=[('day', 'Day'), ('night', 'Night')], validators=[DataRequired()])
+    advance_paid = FloatField('Advance Paid', default=0.0)
+    balance = FloatField('Balance', default=0.0)
+    total = FloatField('Total', default=0.0)
+    submit = SubmitField('Book')
+
+class BackupForm(FlaskForm):
+    since = StringField('Changes Since (optional)')
+    submit = SubmitField('Create Backup')
+
+class RestoreForm(FlaskForm):
+    schema_file = FileField('Schema File (.sql)', validators=[DataRequired()])
+    data_file = FileField('Data File (.json or .ndjson.gz)', validators=[DataRequired()])
+    submit = SubmitField('Restore Database')
+
+class SearchForm(FlaskForm):
+    query = StringField('Search', validators=[DataRequired()])
+    submit = SubmitField('Search')
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Per-process LRU of rendered HTML fragments, bounded by their total size.
+
+    Keys end with the data version (app.data_versions) of the hall and month
+    a fragment shows, so a booking change in any process moves readers to a
+    new key and the old entry simply ages out. Misses must render from fresh
+    database reads rather than the TTL-bound caches, so no entry is older
+    than the version in its key.
+    """
+
+    def __init__(self, max_bytes=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._fragments = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._fragments.clear()
+            self._bytes = 0
+
+    def get(self, key, render):
+        """Markup for ``key``, calling ``render()`` for the HTML on a miss."""
+        with self._lock:
+            entry = self._fragments.get(key)
+            if entry is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        html = Markup(render())
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return html
+        with self._lock:
+            previous = self._fragments.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._fragments[key] = (html, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._fragments.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._fragments),
+                    'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+fragments = FragmentCache()
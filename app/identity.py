@@ -0,0 +1,148 @@
+import threading
+import time
+
+from flask import session
+from flask_login import UserMixin, user_logged_in, user_logged_out
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import load_only
+
+from app import db
+from app.models import User, load_profile
+
+# Signed-session key holding the signed-in user's cached identity
+SESSION_KEY = '_identity'
+# What base.html and the role checks read; changing any of them (or the
+# password) bumps the user's session_version
+FIELDS = ('username', 'name', 'role')
+TRACKED = FIELDS + ('password_hash',)
+
+
+class SessionUser(UserMixin):
+    """current_user built from the session's cached identity, without a query."""
+
+    def __init__(self, id, username, name, role):
+        self.id = id
+        self.username = username
+        self.name = name
+        self.role = role
+
+    def check_password(self, password):
+        # The hash is never cached; password prompts load it
+        user = db.session.get(User, self.id, options=(load_only(User.password_hash),))
+        return user is not None and user.check_password(password)
+
+
+def identity_of(user):
+    return {'id': user.id, 'version': user.session_version, **{name: getattr(user, name) for name in FIELDS}}
+
+
+class IdentityCache:
+    """Per-process map of user id to current session_version with a TTL.
+
+    A session whose cached identity carries the version known here is trusted
+    without a query; a mismatch or an expired entry reloads the user once.
+    Changes made in this process are seen at once, another process's after at
+    most ``ttl`` seconds (0 checks the database on every request).
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def configure(self, ttl):
+        with self._lock:
+            self.ttl = ttl
+            self._versions.clear()
+
+    def _known(self, user_id):
+        entry = self._versions.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def remember(self, user):
+        """Cache ``user``'s identity in the session and its version here."""
+        identity = identity_of(user)
+        if session.get(SESSION_KEY) != identity:
+            session[SESSION_KEY] = identity
+        with self._lock:
+            self._versions[user.id] = (user.session_version, time.monotonic())
+        return SessionUser(*(identity[name] for name in ('id',) + FIELDS))
+
+    def load(self, user_id):
+        """current_user for ``user_id``: from the session when its version is
+        current, else from the database (None if the user is gone)."""
+        cached = session.get(SESSION_KEY)
+        if cached and cached.get('id') == user_id:
+            with self._lock:
+                known = self._known(user_id)
+                if known is not None and known == cached.get('version'):
+                    self.hits += 1
+                    return SessionUser(*(cached[name] for name in ('id',) + FIELDS))
+                if known is not None:
+                    self.stale += 1
+        with self._lock:
+            self.misses += 1
+        user = db.session.get(User, user_id, options=load_profile('session-user'))
+        if user is None:
+            session.pop(SESSION_KEY, None)
+            self.forget([user_id])
+            return None
+        return self.remember(user)
+
+    def forget(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._versions.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._versions), 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses,
+                    'stale': self.stale}
+
+
+identities = IdentityCache()
+
+
+@user_logged_in.connect
+def _remember_login(sender, user, **extra):
+    identities.remember(user)
+
+
+@user_logged_out.connect
+def _forget_logout(sender, user, **extra):
+    session.pop(SESSION_KEY, None)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_versions(session, flush_context, instances):
+    changed = session.info.setdefault('identity_changes', set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in TRACKED):
+                obj.session_version = (obj.session_version or 0) + 1
+                changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _forget_changed(session):
+    changed = session.info.pop('identity_changes', None)
+    if changed:
+        identities.forget(changed)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changed(session, previous_transaction):
+    session.info.pop('identity_changes', None)
@@ -0,0 +1,139 @@
+import json
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# A statement run this many times in one request is reported as a likely N+1
+N_PLUS_ONE_REPEATS = 3
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r'\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)')
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def fingerprint(statement):
+    """The statement with literals and placeholder lists folded, so the same
+    query with different values counts as a repeat."""
+    statement = _LITERALS.sub('?', _WHITESPACE.sub(' ', statement).strip())
+    return _PLACEHOLDER_LISTS.sub('(?)', statement)
+
+
+class RequestQueries:
+    """SQL executed while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.paused = 0
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, minimum=2):
+        """[(fingerprint, count)] for statements run at least ``minimum`` times, most frequent first."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= minimum]
+
+
+def _current():
+    return g.get('sql_queries') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current()
+    started = getattr(context, '_query_started', None)
+    if queries is not None and started is not None and not queries.paused:
+        queries.record(statement, time.perf_counter() - started)
+
+
+@contextmanager
+def uncounted():
+    """Leave statements run inside the block out of the request's count and
+    budget, for work whose size is set by configuration rather than the view
+    (such as one ping per pooled connection)."""
+    queries = _current()
+    if queries is None:
+        yield
+        return
+    queries.paused += 1
+    try:
+        yield
+    finally:
+        queries.paused -= 1
+
+
+def query_budget(limit):
+    """Declare the most queries a view may run per request (checked after the response)."""
+    def decorate(view):
+        view.query_budget = limit
+        return view
+    return decorate
+
+
+def _start_request():
+    g.sql_queries = RequestQueries()
+
+
+def _finish_request(response):
+    queries = g.pop('sql_queries', None)
+    if queries is None:
+        return response
+    db_ms = queries.seconds * 1000
+    timing = f'db;dur={db_ms:.2f};desc="{queries.count} queries"'
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    suspects = queries.repeated(N_PLUS_ONE_REPEATS)
+    line = {'method': request.method, 'path': request.path, 'endpoint': request.endpoint, 'status': response.status_code,
+            'queries': queries.count, 'db_ms': round(db_ms, 2), 'budget': budget,
+            'repeated': [{'sql': sql[:200], 'count': count} for sql, count in queries.repeated()]}
+    over_budget = budget is not None and queries.count > budget
+    if over_budget or suspects:
+        current_app.logger.warning('sql %s', json.dumps(line))
+    else:
+        current_app.logger.info('sql %s', json.dumps(line))
+
+    if over_budget and _enforcing():
+        repeats = '; '.join(f'{count}x {sql[:120]}' for sql, count in queries.repeated())
+        raise QueryBudgetExceeded(f'{request.endpoint} ran {queries.count} queries, over its budget of {budget}'
+                                  + (f' (repeated: {repeats})' if repeats else ''))
+    return response
+
+
+def _enforcing():
+    enforce = current_app.config.get('QUERY_BUDGET_ENFORCE')
+    if enforce is None:
+        return current_app.debug or current_app.testing
+    return enforce
+
+
+def init_app(app):
+    """Count every statement per request, report it in Server-Timing and the
+    log, and check each view's query_budget (raising in debug/testing, or
+    when QUERY_BUDGET_ENFORCE is set; logging a warning otherwise).
+
+    Streamed response bodies run after the check, so their queries are not counted.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,86 @@
+from datetime import date
+
+from sqlalchemy import select, tuple_, union_all
+
+from app import db
+from app.models import Booking, Hall
+
+PAGE_SIZE = 50
+
+# Only the columns booking_list.html shows, with the hall name joined in
+LIST_COLUMNS = (
+    Booking.id,
+    Booking.bid,
+    Booking.hall_id,
+    Booking.date,
+    Booking.time_slot,
+    Booking.client_name,
+    Booking.status,
+    Hall.name.label('hall_name'),
+)
+
+
+def encode_cursor(row):
+    return f'{row.date.isoformat()}.{row.time_slot}.{row.id}'
+
+
+def decode_cursor(cursor):
+    """Parse an ``after`` cursor into a (date, time_slot, id) key, or None."""
+    try:
+        day, time_slot, booking_id = cursor.split('.')
+        return date.fromisoformat(day), time_slot, int(booking_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def list_bookings(hall_id=None, status=None, time_slot=None, start_date=None, end_date=None, after=None, limit=PAGE_SIZE):
+    """One page of bookings matching every given filter.
+
+    Pages are ordered by (date, time_slot, id) and continue after the key in
+    ``after`` (keyset pagination), so deep pages cost the same as the first.
+    ``end_date`` is exclusive. Returns ``(rows, next_cursor)`` where
+    ``next_cursor`` is None on the last page.
+    """
+    query = db.session.query(*LIST_COLUMNS).join(Hall, Booking.hall_id == Hall.id)
+    if hall_id is not None:
+        query = query.filter(Booking.hall_id == hall_id)
+    if status:
+        query = query.filter(Booking.status == status)
+    if time_slot:
+        query = query.filter(Booking.time_slot == time_slot)
+    if start_date is not None:
+        query = query.filter(Booking.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Booking.date < end_date)
+    if after is not None:
+        query = query.filter(tuple_(Booking.date, Booking.time_slot, Booking.id) > tuple_(*after))
+    rows = query.order_by(Booking.date, Booking.time_slot, Booking.id).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+# Only the columns the dashboard's upcoming cards show
+UPCOMING_COLUMNS = (Booking.id, Booking.hall_id, Booking.date, Booking.time_slot, Booking.client_name, Booking.status)
+
+
+def upcoming_by_hall(hall_ids, today, per_hall):
+    """{hall_id: [rows]} with the next ``per_hall`` bookings of each hall from
+    ``today`` on, in one query however many halls there are.
+
+    Each hall gets its own LIMITed branch of a UNION ALL, so every branch stops
+    after ``per_hall`` rows of the (hall_id, date) index and a busy hall cannot
+    crowd the others out the way a single LIMIT would.
+    """
+    upcoming = {hall_id: [] for hall_id in hall_ids}
+    if not hall_ids:
+        return upcoming
+    order = (Booking.date, Booking.time_slot, Booking.id)
+    branches = [select(*UPCOMING_COLUMNS).where(Booking.hall_id == hall_id, Booking.date >= today)
+                .order_by(*order).limit(per_hall).subquery() for hall_id in hall_ids]
+    rows = db.session.execute(union_all(*(select(branch) for branch in branches)))
+    for row in rows:
+        upcoming[row.hall_id].append(row)
+    for rows in upcoming.values():
+        rows.sort(key=lambda row: (row.date, row.time_slot, row.id))
+    return upcoming
@@ -1,8 +1,8 @@
 from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-import random
-import string
+from sqlalchemy.orm import joinedload, load_only, noload
+import re
 from datetime import datetime, timezone, timedelta
 
 # Define IST timezone (UTC+5:30)
@@ -14,12 +14,18 @@ def current_ist():
 def current_utc():
     return datetime.utcnow()
 
+def normalize_phone(phone):
+    # Digits only, so '+91 98765-43210' and '9876543210' match each other
+    return re.sub(r'\D', '', phone or '')
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     name = db.Column(db.String(150), nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(50), nullable=False, default='user')  # 'admin' or 'user'
+    # Bumped when anything the cached session identity holds changes (app.identity)
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -32,6 +38,9 @@ class Hall(db.Model):
     name = db.Column(db.String(100), unique=True, nullable=False)
 
 class Booking(db.Model):
+    # One booking per hall, date and slot; also serves (hall_id, date) lookups
+    __table_args__ = (db.UniqueConstraint('hall_id', 'date', 'time_slot', name='uq_booking_hall_date_slot'),)
+
     id = db.Column(db.Integer, primary_key=True)
     bid = db.Column(db.String(6), unique=True, nullable=False)
     hall_id = db.Column(db.Integer, db.ForeignKey('hall.id'), nullable=False)
@@ -39,6 +48,7 @@ class Booking(db.Model):
     time_slot = db.Column(db.String(10), nullable=False)  # 'day' or 'night'
     client_name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
+    phone_digits = db.Column(db.String(20), nullable=True, index=True)
     address = db.Column(db.String(200), nullable=False)
     status = db.Column(db.String(20), nullable=False, default='pending')  # 'confirmed' or 'pending'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -48,12 +58,74 @@ class Booking(db.Model):
     balance = db.Column(db.Float, nullable=True, default=0.0)
     total = db.Column(db.Float, nullable=True, default=0.0)
 
-    hall = db.relationship('Hall', backref=db.backref('bookings', lazy='selectin', order_by='Booking.date'))
-    user = db.relationship('User', backref=db.backref('bookings', lazy='selectin'))
+    # Backrefs load on access only; routes opt into eager loading via load_profile()
+    hall = db.relationship('Hall', backref=db.backref('bookings', lazy='select', order_by='Booking.date'))
+    user = db.relationship('User', backref=db.backref('bookings', lazy='select'))
 
     @staticmethod
     def generate_bid():
-        while True:
-            bid = ''.join(random.choices(string.digits, k=6))
-            if not Booking.query.filter_by(bid=bid).first():
-                return bid
\ No newline at end of file
+        # Scrambled counter from app.bids; no lookup, the unique index is the guard
+        from app.bids import allocator
+        return allocator.next_bid()
+
+
+class BidSequence(db.Model):
+    # Next unallocated BID counter value; app.bids reserves blocks of it
+    name = db.Column(db.String(20), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class BookingRollup(db.Model):
+    # Booking count and money per hall, month, slot and status; app.rollups
+    # keeps it in step with booking inside the same transaction
+    __tablename__ = 'booking_rollup'
+
+    hall_id = db.Column(db.Integer, db.ForeignKey('hall.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    time_slot = db.Column(db.String(10), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    advance_paid = db.Column(db.Float, nullable=False, default=0.0)
+    balance = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class DataVersion(db.Model):
+    # Bumped by every booking change in a hall and month (hall_id 0, year 0,
+    # month 0 by restores); app.data_versions turns it into page validators
+    __tablename__ = 'data_version'
+
+    hall_id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=current_utc)
+
+
+@db.event.listens_for(BidSequence.__table__, 'after_create')
+def _seed_bid_sequence(table, connection, **kw):
+    # The migration seeds migrated databases; this covers create_all
+    connection.execute(table.insert().values(name='booking', next_value=0))
+
+
+@db.event.listens_for(Booking, 'before_insert')
+@db.event.listens_for(Booking, 'before_update')
+def _sync_phone_digits(mapper, connection, target):
+    target.phone_digits = normalize_phone(target.phone)
+
+
+# Named relationship loading profiles. Each route picks one explicitly so that
+# loading a hall or a user never drags its whole booking history along.
+LOAD_PROFILES = {
+    # Hall rows for dashboards and calendar headers (Hall queries)
+    'calendar': lambda: (noload(Hall.bookings),),
+    # Single booking pages and receipts: hall only, never the creator's history
+    'detail': lambda: (joinedload(Booking.hall).noload(Hall.bookings), noload(Booking.user)),
+    # Flask-Login identity fetch: only what base.html and role checks need
+    'session-user': lambda: (load_only(User.id, User.username, User.name, User.role, User.session_version),
+                             noload(User.bookings)),
+}
+
+def load_profile(name):
+    return LOAD_PROFILES[name]()
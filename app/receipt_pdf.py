@@ -0,0 +1,83 @@
+# ReportLab layout for booking receipts. Imported by app.receipts only on a
+# cache miss, so ReportLab stays off the cold-start path; styles are built
+# once per process.
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Spacer, Table, TableStyle
+
+COLUMN_WIDTHS = [120, 300]
+
+_HEADER_COMMANDS = [
+    ('SPAN', (0, 0), (1, 0)),  # Merge header row
+    ('BACKGROUND', (0, 0), (1, 0), colors.lightgrey),  # Header row
+    ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (1, 0), 10),
+    ('ALIGN', (0, 0), (1, 0), 'CENTER'),  # Center the merged header
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+]
+
+BOOKING_STYLE = TableStyle(_HEADER_COMMANDS + [
+    ('FONTNAME', (1, 1), (1, 1), 'Helvetica-Bold'),  # Bold BID
+    # Highlight Hall
+    ('BACKGROUND', (0, 2), (-1, 2), colors.lightgrey),
+    ('FONTNAME', (0, 2), (1, 2), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 2), (1, 2), 10),
+    # Highlight Date
+    ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
+    ('FONTNAME', (0, 3), (1, 3), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 3), (1, 3), 10),
+])
+
+PAYMENT_STYLE = TableStyle(_HEADER_COMMANDS + [
+    ('FONTNAME', (1, 1), (1, -1), 'Helvetica-Bold'),  # Bold the amount column
+])
+
+LINE_STYLE = TableStyle([
+    ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+def _copy(fields):
+    """Flowables for one copy (company or customer) of the receipt."""
+    booking_table = Table([['Booking Details', '']] + fields.details, colWidths=COLUMN_WIDTHS)
+    booking_table.setStyle(BOOKING_STYLE)
+    payment_table = Table([['Payment Information', '']] + fields.payment, colWidths=COLUMN_WIDTHS)
+    payment_table.setStyle(PAYMENT_STYLE)
+    return [booking_table, Spacer(1, 10), payment_table]
+
+
+def _receipt(fields):
+    """Company copy, a rule, then the customer copy."""
+    line_table = Table([['']], colWidths=[420])
+    line_table.setStyle(LINE_STYLE)
+    return _copy(fields) + [Spacer(1, 15), line_table, Spacer(1, 15)] + _copy(fields)
+
+
+def _build(flowables):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=30, bottomMargin=30, leftMargin=30, rightMargin=30)
+    doc.build(flowables)
+    return buffer.getvalue()
+
+
+def render(fields):
+    """PDF bytes for one receipt."""
+    return _build(_receipt(fields))
+
+
+def render_many(fields_list):
+    """One PDF with a page per receipt, laid out in a single build."""
+    flowables = []
+    for fields in fields_list:
+        if flowables:
+            flowables.append(PageBreak())
+        flowables.extend(_receipt(fields))
+    return _build(flowables)
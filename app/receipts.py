@@ -0,0 +1,230 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import timezone
+
+from app.models import Booking, IST, load_profile
+
+# Receipts in one batch download; narrow the filter for more
+MAX_BATCH = 500
+
+# What a receipt shows, as display strings: [label, value] rows for each table
+ReceiptFields = namedtuple('ReceiptFields', ['bid', 'details', 'payment'])
+
+
+def _ist(value):
+    # Stored timestamps are naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(IST).strftime('%d %b %Y at %I:%M %p')
+
+
+def receipt_fields(booking):
+    details = [
+        ['BID:', booking.bid],
+        ['Hall:', booking.hall.name],
+        ['Date:', booking.date.strftime('%d %b %Y')],
+        ['Time Slot:', booking.time_slot.title()],
+        ['Client Name:', booking.client_name],
+        ['Phone:', booking.phone],
+        ['Address:', booking.address],
+        ['Status:', booking.status.title()],
+        ['Booked on:', _ist(booking.created_at)],
+    ]
+    if booking.confirmed_at:
+        details.append(['Confirmed on:', _ist(booking.confirmed_at)])
+    payment = [
+        ['Total:', f'{booking.total or 0:.2f}'],
+        ['Advance Paid:', f'{booking.advance_paid or 0:.2f}'],
+        ['Balance:', f'{booking.balance or 0:.2f}'],
+    ]
+    return ReceiptFields(booking.bid, details, payment)
+
+
+def content_hash(fields):
+    """Digest of everything printed on the receipt."""
+    digest = hashlib.sha1()
+    for label, value in fields.details + fields.payment:
+        digest.update(f'{label}\x1f{value}\x1e'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ReceiptCache:
+    """Per-process LRU of rendered receipt PDFs keyed by booking id.
+
+    Each entry remembers the content hash it was rendered from, so a booking
+    changed by another process renders afresh; the write routes also drop
+    entries explicitly to free the memory. Batch misses are rendered in a
+    worker pool of ``workers`` processes, or threads where the platform
+    cannot start processes (AWS Lambda has no semaphores).
+    """
+
+    def __init__(self, maxsize=64, workers=2):
+        self.maxsize = maxsize
+        self.workers = workers
+        self._pdfs = OrderedDict()
+        self._pool = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, maxsize, workers):
+        with self._lock:
+            self.maxsize = maxsize
+            if workers != self.workers and self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            self.workers = workers
+            self._pdfs.clear()
+
+    def _lookup(self, booking_id, digest):
+        with self._lock:
+            entry = self._pdfs.get(booking_id)
+            if entry is not None and entry[0] == digest:
+                self._pdfs.move_to_end(booking_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _store(self, booking_id, digest, pdf):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._pdfs[booking_id] = (digest, pdf)
+            self._pdfs.move_to_end(booking_id)
+            while len(self._pdfs) > self.maxsize:
+                self._pdfs.popitem(last=False)
+
+    def get(self, booking):
+        """(pdf_bytes, content_hash) for ``booking``, rendering on a miss."""
+        fields = receipt_fields(booking)
+        digest = content_hash(fields)
+        pdf = self._lookup(booking.id, digest)
+        if pdf is None:
+            from app.receipt_pdf import render
+            pdf = render(fields)
+            self._store(booking.id, digest, pdf)
+        return pdf, digest
+
+    def _executor(self):
+        # Only batch downloads need a pool, so its imports wait until then
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        with self._lock:
+            if self._pool is None:
+                try:
+                    pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                    pool.submit(int).result()  # fail here, not halfway through a download
+                except (OSError, NotImplementedError, BrokenProcessPool):
+                    pool = ThreadPoolExecutor(self.workers)
+                self._pool = pool
+            return self._pool
+
+    def pdfs(self, bookings):
+        """Iterator of (bid, pdf_bytes) in order.
+
+        The fields are read from the bookings right away, so the iterator can
+        outlive the session; cache misses are rendered in the worker pool.
+        """
+        entries = []
+        for booking in bookings:
+            fields = receipt_fields(booking)
+            digest = content_hash(fields)
+            entries.append((booking.id, fields, digest, self._lookup(booking.id, digest)))
+        misses = [fields for _, fields, _, pdf in entries if pdf is None]
+        rendered = iter(())
+        if misses:
+            from app.receipt_pdf import render
+            rendered = self._executor().map(render, misses) if self.workers > 1 and len(misses) > 1 else map(render, misses)
+
+        def generate():
+            for booking_id, fields, digest, pdf in entries:
+                if pdf is None:
+                    pdf = next(rendered)
+                    self._store(booking_id, digest, pdf)
+                yield fields.bid, pdf
+        return generate()
+
+    def invalidate(self, booking_id):
+        with self._lock:
+            self._pdfs.pop(booking_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._pdfs.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._pdfs), 'maxsize': self.maxsize,
+                    'bytes': sum(len(pdf) for _, pdf in self._pdfs.values()), 'workers': self.workers,
+                    'pool': type(self._pool).__name__ if self._pool else None}
+
+
+receipts = ReceiptCache()
+
+
+def receipt_bookings(ids=None, hall_id=None, status=None, time_slot=None, start_date=None, end_date=None):
+    """Bookings for a batch download, by id list or by the booking list
+    filters (``end_date`` exclusive), in list order. At most MAX_BATCH + 1
+    rows are loaded so callers can tell the batch was too large."""
+    query = Booking.query.options(*load_profile('detail'))
+    if ids is not None:
+        query = query.filter(Booking.id.in_(ids))
+    if hall_id is not None:
+        query = query.filter(Booking.hall_id == hall_id)
+    if status:
+        query = query.filter(Booking.status == status)
+    if time_slot:
+        query = query.filter(Booking.time_slot == time_slot)
+    if start_date is not None:
+        query = query.filter(Booking.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Booking.date < end_date)
+    return query.order_by(Booking.date, Booking.time_slot, Booking.id).limit(MAX_BATCH + 1).all()
+
+
+def combined_pdf(bookings):
+    """All receipts as one multi-page PDF from a single document build.
+
+    Deliberately outside the worker pool and not streamed: ReportLab lays out
+    and writes a document in one build, and merging per-receipt PDFs would
+    need a PDF library this project does not ship. MAX_BATCH bounds the build;
+    the ZIP format is the pooled, streamed path.
+    """
+    from app.receipt_pdf import render_many
+    return render_many([receipt_fields(booking) for booking in bookings])
+
+
+class _Sink:
+    """Write-only target for ZipFile whose output is drained between entries."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(pdfs):
+    """Stream a ZIP of (bid, pdf_bytes) pairs, one entry per receipt.
+
+    The PDFs are already compressed, so entries are stored as-is.
+    """
+    import zipfile
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for bid, pdf in pdfs:
+            archive.writestr(f'receipt_{bid}.pdf', pdf)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,108 @@
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.bids import COMMIT_ATTEMPTS, allocator, is_bid_conflict
+from app.data_versions import touch, version_key
+from app.dbaccess import dialect_insert
+from app.models import Booking, normalize_phone
+from app.rollups import add_booking, apply_deltas, new_deltas
+
+SLOT_COLUMNS = ('hall_id', 'date', 'time_slot')
+# Slots accepted by one batch request
+BATCH_LIMIT = 100
+
+
+def _slot_insert(*returning):
+    """INSERT that yields no row, instead of failing, when the slot is taken."""
+    return dialect_insert(Booking.__table__).on_conflict_do_nothing(
+        index_elements=list(SLOT_COLUMNS)).returning(*returning)
+
+
+def booking_values(**values):
+    """Column values for a Core booking insert.
+
+    Core inserts skip the ORM's before_insert hook, so the phone digits it
+    maintains are filled in here.
+    """
+    values['phone_digits'] = normalize_phone(values.get('phone'))
+    return values
+
+
+def reserve_slot(values, attempts=COMMIT_ATTEMPTS):
+    """Book a (hall, date, slot) in one statement and commit.
+
+    The unique constraint on the slot decides the winner of concurrent
+    submissions; there is no availability read beforehand. Returns the new
+    booking id, or None when the slot was already booked. A BID that clashes
+    with an old random one is retried with the next allocated value. The
+    booking is counted into booking_rollup, and its month's data version
+    bumped, in the same transaction.
+    """
+    for attempt in range(attempts):
+        params = booking_values(bid=allocator.next_bid(), **values)
+        try:
+            booking_id = db.session.execute(_slot_insert(Booking.id), params).scalar()
+            if booking_id is not None:
+                apply_deltas(db.session, add_booking(new_deltas(), params))
+                touch(db.session, {version_key(params['hall_id'], params['date'])})
+            db.session.commit()
+            return booking_id
+        except IntegrityError as exc:
+            db.session.rollback()
+            if not is_bid_conflict(exc) or attempt == attempts - 1:
+                raise
+
+
+def taken_slots(slots):
+    """The subset of (hall_id, date, time_slot) tuples already booked, in one query."""
+    if not slots:
+        return set()
+    slot_key = tuple_(Booking.hall_id, Booking.date, Booking.time_slot)
+    return set(map(tuple, db.session.query(Booking.hall_id, Booking.date, Booking.time_slot).filter(slot_key.in_(slots))))
+
+
+def reserve_slots(details, slots, atomic=False, attempts=COMMIT_ATTEMPTS):
+    """Book distinct (hall_id, date, time_slot) ``slots`` for one client.
+
+    Booked slots are found with one set-based query and skipped, or with
+    ``atomic`` abort the whole batch. The rest get BIDs from at most one
+    block reservation and go in with one multi-row insert and one commit.
+    Returns {slot: (booking_id, bid)} with None for slots that were taken,
+    including any lost to a concurrent request between the check and the
+    insert. Slots left out of an aborted atomic batch are not in the result.
+    The booked slots are counted into booking_rollup, and their months' data
+    versions bumped, before the commit.
+    """
+    taken = taken_slots(slots)
+    results = dict.fromkeys(taken)
+    free = [slot for slot in slots if slot not in taken]
+    if not free or (atomic and taken):
+        return results
+
+    for attempt in range(attempts):
+        rows = [booking_values(bid=bid, hall_id=hall_id, date=day, time_slot=time_slot, **details)
+                for bid, (hall_id, day, time_slot) in zip(allocator.next_bids(len(free)), free)]
+        try:
+            inserted = db.session.execute(
+                _slot_insert(Booking.id, Booking.bid, Booking.hall_id, Booking.date, Booking.time_slot), rows).all()
+        except IntegrityError as exc:
+            db.session.rollback()
+            if not is_bid_conflict(exc) or attempt == attempts - 1:
+                raise
+            continue
+        won = {(hall_id, day, time_slot): (booking_id, bid) for booking_id, bid, hall_id, day, time_slot in inserted}
+        lost = dict.fromkeys(slot for slot in free if slot not in won)
+        results.update(lost)
+        if atomic and lost:
+            db.session.rollback()
+            return results
+        deltas = new_deltas()
+        for row in rows:
+            if (row['hall_id'], row['date'], row['time_slot']) in won:
+                add_booking(deltas, row)
+        apply_deltas(db.session, deltas)
+        touch(db.session, {version_key(hall_id, day) for hall_id, day, _ in won})
+        db.session.commit()
+        results.update(won)
+        return results
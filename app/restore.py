@@ -0,0 +1,297 @@
+import codecs
+import gzip
+import json
+import time
+from io import StringIO
+
+from sqlalchemy import bindparam, inspect, text
+
+# Insert order follows foreign keys; deletes run in reverse
+TABLE_ORDER = ['user', 'hall', 'booking', 'bid_sequence']
+SERIAL_TABLES = ['user', 'hall', 'booking']
+# Rows matched on this column by incremental restores (default 'id')
+KEY_COLUMNS = {'bid_sequence': 'name'}
+# Incremental restores overwrite these; other tables only gain missing rows
+MERGE_REPLACE = {'booking', 'bid_sequence'}
+# Derived from booking, so rebuilt after a restore rather than backed up
+ROLLUP_TABLE = 'booking_rollup'
+VERSION_TABLE = 'data_version'
+BATCH_SIZE = 1000
+
+
+class _JSONStream:
+    """Incremental reader for one JSON document from a text or binary file."""
+
+    def __init__(self, fp, chunk_size=1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.fp.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        if isinstance(data, bytes):
+            data = self.utf8.decode(data)
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'Malformed backup: expected {char!r} at offset {self.pos}')
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                self.pos = end
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+
+def iter_json_rows(fp):
+    """Yield (table_name, row) from a ``{"table": [row, ...], ...}`` backup
+    without loading the whole document."""
+    stream = _JSONStream(fp)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        table_name = stream.value()
+        stream.expect(':')
+        if stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield table_name, stream.value()
+                    if stream.peek() == ',':
+                        stream.pos += 1
+                        continue
+                    stream.expect(']')
+                    break
+        else:
+            stream.value()  # null for empty tables
+        if stream.peek() == ',':
+            stream.pos += 1
+            continue
+        stream.expect('}')
+        return
+
+
+class _Prefixed:
+    """File wrapper that replays bytes already read for format sniffing."""
+
+    def __init__(self, fp, head):
+        self.fp = fp
+        self.head = head
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.fp.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.fp.read(), b''
+            return data
+        data, self.head = self.head[:size], self.head[size:]
+        if len(data) < size:
+            data += self.fp.read(size - len(data))
+        return data
+
+
+def _iter_ndjson_rows(lines):
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            yield record['table'], record['row']
+
+
+def open_backup(fp):
+    """Detect the backup format and return (rows, header).
+
+    Accepts gzip-compressed NDJSON from app.backup (header is its first line)
+    and the older single JSON document (header is None).
+    """
+    head = fp.read(2)
+    if isinstance(head, str):
+        head = head.encode('utf-8')
+    fp = _Prefixed(fp, head)
+    if head != b'\x1f\x8b':
+        return iter_json_rows(fp), None
+    lines = gzip.GzipFile(fileobj=fp, mode='rb')
+    header = json.loads(lines.readline())
+    return _iter_ndjson_rows(lines), header
+
+
+def restore_schema(conn, schema_sql, existing=None):
+    """Run the CREATE TABLE statements for app tables that do not exist yet.
+
+    ``existing`` is the set of table names already present; it is inspected
+    when not given. Returns the app tables present afterwards.
+    """
+    if existing is None:
+        existing = set(inspect(conn).get_table_names())
+    present = {name for name in TABLE_ORDER if name in existing}
+    for stmt in (s.strip() for s in schema_sql.split(';')):
+        for table_name in TABLE_ORDER:
+            if stmt.startswith(f'CREATE TABLE "{table_name}"') or stmt.startswith(f'CREATE TABLE {table_name} '):
+                if table_name not in present:
+                    conn.execute(text(stmt))
+                    present.add(table_name)
+    return present
+
+
+def _csv_field(value):
+    # COPY ... (FORMAT csv): an unquoted empty field is NULL, a quoted one is ''
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _insert_batch(conn, table_name, columns, rows, use_copy):
+    if use_copy:
+        buffer = StringIO()
+        for row in rows:
+            buffer.write(','.join(_csv_field(row.get(c)) for c in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+        column_list = ', '.join(f'"{c}"' for c in columns)
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.execute(f'COPY "{table_name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', stream=buffer)
+        return
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    placeholders = ', '.join(f':{c}' for c in columns)
+    conn.execute(text(f'INSERT INTO "{table_name}" ({column_list}) VALUES ({placeholders})'), rows)
+
+
+def reset_sequences(conn, tables=SERIAL_TABLES):
+    """Move PostgreSQL id sequences past the restored ids."""
+    if conn.dialect.name != 'postgresql':
+        return
+    for table_name in tables:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table_name}\"', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM \"{table_name}\""))
+
+
+def restore_rows(conn, rows, progress=None, batch_size=BATCH_SIZE, replace=True, tables=TABLE_ORDER):
+    """Load ``rows`` ((table_name, row) pairs in dependency order) inside the
+    caller's transaction.
+
+    With ``replace`` the app ``tables`` are emptied first. Otherwise
+    (incremental backups) bookings and the BID counter replace existing rows
+    with the same key, while users and halls that already exist are kept so
+    their bookings stay valid. Rows are batched per table into one executemany
+    each, or one COPY each on PostgreSQL through pg8000.
+    ``progress(table_name, count)`` is called after every batch. Returns
+    {table_name: rows_restored}.
+
+    Bookings missing ``phone_digits`` (older backups) get it computed here,
+    as these inserts bypass the ORM hook that normally fills it.
+    """
+    use_copy = conn.dialect.name == 'postgresql' and conn.dialect.driver == 'pg8000'
+    fill_digits = 'booking' in tables and any(
+        column['name'] == 'phone_digits' for column in inspect(conn).get_columns('booking'))
+    if fill_digits:
+        from app.models import normalize_phone
+    if replace:
+        for table_name in reversed(TABLE_ORDER):
+            if table_name in tables:
+                conn.execute(text(f'DELETE FROM "{table_name}"'))
+
+    counts = {}
+    batch = []
+    batch_key = None
+
+    def flush():
+        if batch:
+            table_name, columns = batch_key
+            if not replace:
+                key = KEY_COLUMNS.get(table_name, 'id')
+                ids = {'ids': [row[key] for row in batch]}
+                if table_name in MERGE_REPLACE:
+                    conn.execute(text(f'DELETE FROM "{table_name}" WHERE "{key}" IN :ids').bindparams(bindparam('ids', expanding=True)), ids)
+                else:
+                    existing = set(conn.execute(text(f'SELECT "{key}" FROM "{table_name}" WHERE "{key}" IN :ids').bindparams(bindparam('ids', expanding=True)), ids).scalars())
+                    batch[:] = [row for row in batch if row[key] not in existing]
+            if batch:
+                _insert_batch(conn, table_name, columns, batch, use_copy)
+            counts[table_name] = counts.get(table_name, 0) + len(batch)
+            if progress:
+                progress(table_name, counts[table_name])
+            batch.clear()
+
+    for table_name, row in rows:
+        if table_name not in tables:
+            continue
+        if fill_digits and table_name == 'booking' and not row.get('phone_digits'):
+            row = {**row, 'phone_digits': normalize_phone(row.get('phone'))}
+        key = (table_name, tuple(row))
+        if key != batch_key or len(batch) >= batch_size:
+            flush()
+            batch_key = key
+        batch.append(row)
+    flush()
+
+    if 'bid_sequence' in tables:
+        # Backups from before the BID counter start it afresh
+        conn.execute(text("INSERT INTO bid_sequence (name, next_value) SELECT 'booking', 0 "
+                          "WHERE NOT EXISTS (SELECT 1 FROM bid_sequence WHERE name = 'booking')"))
+    reset_sequences(conn)
+    return counts
+
+
+def restore_backup(conn, schema_sql, data_fp, progress=None, existing=None):
+    """Restore schema and data inside the caller's transaction.
+
+    Full backups replace the tables; incremental ones are merged by key.
+    booking_rollup is not backed up; it is rebuilt from the restored bookings.
+    Every user's session_version is raised so cached session identities reload.
+    Returns (counts, seconds).
+    """
+    started = time.perf_counter()
+    rows, header = open_backup(data_fp)
+    incremental = bool(header and header.get('incremental_since'))
+    if existing is None:
+        existing = set(inspect(conn).get_table_names())
+    tables = restore_schema(conn, schema_sql or '', existing)
+    rollups = ROLLUP_TABLE in existing
+    session_versions = 'user' in existing and any(
+        column['name'] == 'session_version' for column in inspect(conn).get_columns('user'))
+    if session_versions:
+        floor = conn.execute(text('SELECT COALESCE(MAX(session_version), 0) FROM "user"')).scalar()
+    if rollups:
+        # Emptied first: its rows reference the halls being replaced
+        conn.execute(text(f'DELETE FROM "{ROLLUP_TABLE}"'))
+    counts = restore_rows(conn, rows, progress, replace=not incremental, tables=tables)
+    if rollups:
+        from app.rollups import rebuild
+        rebuild(conn)
+    if session_versions:
+        # Above every version a session can hold, so no cached identity
+        # survives a restore that may have changed names, roles or passwords
+        floor = max(floor, conn.execute(text('SELECT COALESCE(MAX(session_version), 0) FROM "user"')).scalar())
+        conn.execute(text('UPDATE "user" SET session_version = :version'), {'version': floor + 1})
+    if VERSION_TABLE in existing:
+        # Any page may differ now; a new restore generation revalidates them all
+        from app.data_versions import GLOBAL, touch
+        touch(conn, {GLOBAL})
+    return counts, time.perf_counter() - started
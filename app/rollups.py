@@ -0,0 +1,182 @@
+from collections import defaultdict
+
+from sqlalchemy import delete, event, extract, func, inspect, select
+
+from app import db
+from app.dbaccess import dialect_insert
+from app.models import Booking, BookingRollup
+
+KEY_COLUMNS = ('hall_id', 'year', 'month', 'time_slot', 'status')
+AMOUNT_COLUMNS = ('bookings', 'total', 'advance_paid', 'balance')
+# Booking attributes that move a booking between rollup rows or change its sums
+TRACKED = ('hall_id', 'date', 'time_slot', 'status', 'total', 'advance_paid', 'balance')
+# Float sums drift by rounding; reconciliation ignores smaller differences
+TOLERANCE = 0.005
+
+
+def rollup_key(values):
+    day = values['date']
+    return values['hall_id'], day.year, day.month, values['time_slot'], values.get('status') or 'pending'
+
+
+def new_deltas():
+    """{rollup key: [bookings, total, advance_paid, balance]} changes to apply."""
+    return defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+
+
+def add_booking(deltas, values, sign=1):
+    """Count the booking column ``values`` into ``deltas`` (sign=-1 takes it out)."""
+    amounts = deltas[rollup_key(values)]
+    amounts[0] += sign
+    amounts[1] += sign * (values.get('total') or 0.0)
+    amounts[2] += sign * (values.get('advance_paid') or 0.0)
+    amounts[3] += sign * (values.get('balance') or 0.0)
+    return deltas
+
+
+def apply_deltas(executor, deltas):
+    """Add ``deltas`` to booking_rollup with one upsert; ``executor`` is the
+    session or connection whose transaction holds the booking change."""
+    rows = [dict(zip(KEY_COLUMNS, key), **dict(zip(AMOUNT_COLUMNS, amounts)))
+            for key, amounts in deltas.items() if any(amounts)]
+    if not rows:
+        return
+    table = BookingRollup.__table__
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    stmt = dialect_insert(table, bind)
+    stmt = stmt.on_conflict_do_update(index_elements=list(KEY_COLUMNS), set_={
+        name: table.c[name] + stmt.excluded[name] for name in AMOUNT_COLUMNS})
+    executor.execute(stmt, rows)
+
+
+def _values(booking, old=False):
+    values = {}
+    state = inspect(booking)
+    for name in TRACKED:
+        if old:
+            history = state.attrs[name].load_history()
+            if history.deleted:
+                values[name] = history.deleted[0]
+                continue
+        values[name] = getattr(booking, name)
+    return values
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault('rollup_deltas', new_deltas())
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            add_booking(deltas, _values(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            add_booking(deltas, _values(obj, old=True), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Booking) and session.is_modified(obj):
+            old, new = _values(obj, old=True), _values(obj)
+            if old != new:
+                add_booking(deltas, old, -1)
+                add_booking(deltas, new)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_deltas(session, flush_context):
+    # After the booking rows are written, so a new hall is already there
+    deltas = session.info.pop('rollup_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_deltas(session, previous_transaction):
+    session.info.pop('rollup_deltas', None)
+
+
+def aggregate():
+    """booking_rollup's rows computed from scratch with one GROUP BY."""
+    year, month = extract('year', Booking.date), extract('month', Booking.date)
+    status = func.coalesce(Booking.status, 'pending')
+    return select(Booking.hall_id, year, month, Booking.time_slot, status, func.count(),
+                  func.coalesce(func.sum(Booking.total), 0.0), func.coalesce(func.sum(Booking.advance_paid), 0.0),
+                  func.coalesce(func.sum(Booking.balance), 0.0)).group_by(Booking.hall_id, year, month, Booking.time_slot, status)
+
+
+def rebuild(conn):
+    """Recompute booking_rollup inside the caller's transaction. Returns the row count."""
+    table = BookingRollup.__table__
+    conn.execute(delete(table))
+    return conn.execute(table.insert().from_select(list(KEY_COLUMNS + AMOUNT_COLUMNS), aggregate())).rowcount
+
+
+def reconcile(conn):
+    """[(key, expected, stored)] for rollup rows that disagree with booking."""
+    expected = {tuple(row[:5]): tuple(row[5:]) for row in conn.execute(aggregate())}
+    table = BookingRollup.__table__
+    stored = {tuple(row[:5]): tuple(row[5:]) for row in conn.execute(
+        select(*(table.c[name] for name in KEY_COLUMNS + AMOUNT_COLUMNS)).where(table.c.bookings != 0))}
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want, have = expected.get(key, (0, 0.0, 0.0, 0.0)), stored.get(key, (0, 0.0, 0.0, 0.0))
+        if want[0] != have[0] or any(abs(a - b) > TOLERANCE for a, b in zip(want[1:], have[1:])):
+            mismatches.append((key, want, have))
+    return mismatches
+
+
+class Figures:
+    """Booking count and money for one cell of the finance report."""
+
+    __slots__ = AMOUNT_COLUMNS
+
+    def __init__(self, bookings=0, total=0.0, advance_paid=0.0, balance=0.0):
+        self.bookings, self.total, self.advance_paid, self.balance = bookings, total, advance_paid, balance
+
+    def add(self, other):
+        self.bookings += other.bookings
+        self.total += other.total
+        self.advance_paid += other.advance_paid
+        self.balance += other.balance
+
+
+def change(current, prior):
+    """Percentage change from ``prior`` to ``current``, or None without a base."""
+    return round((current - prior) * 100 / prior, 1) if prior else None
+
+
+def finance_report(halls, year, status=None):
+    """Billed, collected and outstanding per hall and month of ``year`` next
+    to the year before, from at most 24 rollup rows per hall in one query.
+
+    Returns {'halls': [{'hall', 'months': [(month, current, prior)], 'current', 'prior'}],
+    'current', 'prior'} where current/prior are Figures.
+    """
+    table = BookingRollup.__table__
+    query = select(table.c.hall_id, table.c.year, table.c.month,
+                   *(func.sum(table.c[name]) for name in AMOUNT_COLUMNS)).where(table.c.year.in_((year, year - 1)))
+    if status:
+        query = query.where(table.c.status == status)
+    cells = {}
+    for hall_id, row_year, month, *amounts in db.session.execute(
+            query.group_by(table.c.hall_id, table.c.year, table.c.month)):
+        cells[hall_id, row_year, month] = Figures(*amounts)
+
+    report = {'halls': [], 'current': Figures(), 'prior': Figures()}
+    for hall in halls:
+        entry = {'hall': hall, 'months': [], 'current': Figures(), 'prior': Figures()}
+        for month in range(1, 13):
+            current = cells.get((hall.id, year, month)) or Figures()
+            prior = cells.get((hall.id, year - 1, month)) or Figures()
+            entry['months'].append((month, current, prior))
+            entry['current'].add(current)
+            entry['prior'].add(prior)
+        report['current'].add(entry['current'])
+        report['prior'].add(entry['prior'])
+        report['halls'].append(entry)
+    return report
+
+
+def month_counts(year, month):
+    """{hall_id: bookings} for every hall with bookings in the month, from one grouped query."""
+    table = BookingRollup.__table__
+    rows = db.session.execute(select(table.c.hall_id, func.sum(table.c.bookings)).where(
+        table.c.year == year, table.c.month == month).group_by(table.c.hall_id))
+    return {hall_id: count for hall_id, count in rows}
@@ -1,83 +1,78 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, abort, current_app, make_response
 from flask_login import login_required, current_user
+from markupsafe import Markup
 from app import db
-from app.models import Booking, Hall, User, IST, current_ist, current_utc
-from wtforms import StringField, TextAreaField, SelectField, SubmitField, DateField, FloatField, FileField
-from wtforms.validators import DataRequired
-from flask_wtf import FlaskForm
+from app.instrumentation import query_budget, uncounted
+from app.models import Booking, Hall, User, IST, current_ist, current_utc, load_profile
+from app.calendar_cache import month_grids, month_bounds
+from app.listing import list_bookings, decode_cursor, upcoming_by_hall
+from app.search import search_bookings
+from app.availability import availability, range_codes, encode_runs, DAY, NIGHT
+from app.bids import allocator
+from app.reservations import BATCH_LIMIT, reserve_slot, reserve_slots
+from app.receipts import MAX_BATCH, combined_pdf, iter_zip, receipt_bookings, receipts
+from app.rollups import change, finance_report, month_counts
+from app.data_versions import data_state, hall_versions, not_modified, page_validator, stamp
+from app.fragments import fragments
+from app.identity import identities
+from app.warmup import warmup as process_warmup
 from datetime import date, timezone
 import calendar
-from sqlalchemy import func
-import os
-import json
 import datetime
 
 main = Blueprint('main', __name__)
 
-# Lightweight warmup endpoint to keep Lambda warm (no heavy imports)
+# Pinged by the Vercel cron: the first call in a process fills the pool, compiles
+# the main templates, loads the calendar caches and imports ReportLab
 @main.route('/api/warmup')
+@query_budget(5)
 def warmup():
-    return jsonify({'status': 'warm', 'timestamp': datetime.datetime.now().isoformat()})
-
-class BookingForm(FlaskForm):
-    client_name = StringField('Client Name', validators=[DataRequired()])
-    phone = StringField('Phone Number', validators=[DataRequired()])
-    address = TextAreaField('Address', validators=[DataRequired()])
-    time_slot = SelectField('Time Slot', choices=[('day', 'Day'), ('night', 'Night')], validators=[DataRequired()])
-    advance_paid = FloatField('Advance Paid', default=0.0)
-    balance = FloatField('Balance', default=0.0)
-    total = FloatField('Total', default=0.0)
-    submit = SubmitField('Book')
-
-class BackupForm(FlaskForm):
-    submit = SubmitField('Create Backup')
-
-class RestoreForm(FlaskForm):
-    schema_file = FileField('Schema File (.sql)', validators=[DataRequired()])
-    data_file = FileField('Data File (.json)', validators=[DataRequired()])
-    submit = SubmitField('Restore Database')
-
-class SearchForm(FlaskForm):
-    query = StringField('Search', validators=[DataRequired()])
-    submit = SubmitField('Search')
+    try:
+        report, first = process_warmup.run()
+    except Exception:
+        current_app.logger.exception('Warmup failed')
+        db.session.rollback()
+        return jsonify({'status': 'error', 'timestamp': datetime.datetime.now().isoformat()}), 503
+    return jsonify({'status': 'warm', 'timestamp': datetime.datetime.now().isoformat(), 'first': first, **report})
+
+# Hall cards per dashboard page, and upcoming bookings shown on each card
+HALLS_PER_PAGE = 10
+UPCOMING_PER_HALL = 2
 
 @main.route('/')
+@query_budget(6)
 def index():
-    halls = Hall.query.all()
-    hall_dict = {h.name: h for h in halls}
-    ar_garden = hall_dict.get('AR Garden')
-    diamond_palace = hall_dict.get('Diamond Palace')
-
     # Get year and month from params, default to current
     today = current_ist().date()
     year = request.args.get('year', today.year, type=int)
     month = request.args.get('month', today.month, type=int)
 
-    # Booking counter logic for selected month
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-
-    # Optimized count query
-    booking_counts = db.session.query(Booking.hall_id, func.count(Booking.id)).filter(Booking.date >= start_date, Booking.date < end_date).group_by(Booking.hall_id).all()
-    count_dict = {hid: cnt for hid, cnt in booking_counts}
-    ar_count = count_dict.get(ar_garden.id if ar_garden else 0, 0)
-    diamond_count = count_dict.get(diamond_palace.id if diamond_palace else 0, 0)
-    total_count = ar_count + diamond_count
-
-    # Upcoming bookings for each hall - optimized
-    hall_ids = [h.id for h in halls if h]
-    upcoming = db.session.query(Booking).filter(Booking.date >= today, Booking.hall_id.in_(hall_ids)).order_by(Booking.date).limit(4).all()
-    upcoming_ar = [b for b in upcoming if ar_garden and b.hall_id == ar_garden.id][:2]
-    upcoming_diamond = [b for b in upcoming if diamond_palace and b.hall_id == diamond_palace.id][:2]
-
-    # Bookings for mini calendar - optimized
-    start_of_month = date(year, month, 1)
-    end_of_month = date(year if month < 12 else year + 1, month % 12 + 1, 1)
-    booking_dates_query = db.session.query(Booking.date).filter(Booking.date >= start_of_month, Booking.date < end_of_month).distinct().all()
-    booking_dates = {d[0] for d in booking_dates_query}
+    halls = month_grids.halls()
+    pages = max(1, -(-len(halls) // HALLS_PER_PAGE))
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    page_halls = halls[(page - 1) * HALLS_PER_PAGE:page * HALLS_PER_PAGE]
+
+    # Unchanged month, upcoming bookings and halls: 304 before any booking query
+    state = data_state(year, month, since=today)
+    validator = page_validator(state, today, tuple(halls))
+    cached = not_modified(validator)
+    if cached:
+        return cached
+
+    # One grouped query for every hall's counter, one windowed query for the
+    # upcoming bookings of the halls on this page: the same for 2 or 200 halls
+    counts = month_counts(year, month)
+    total_count = sum(counts.values())
+    upcoming = upcoming_by_hall([h.id for h in page_halls], today, UPCOMING_PER_HALL)
+
+    # Mini calendar rows, rendered once per month, day and data version, from
+    # the availability index at each hall's own version
+    def render_mini_calendar():
+        hall_ids = [h.id for h in halls]
+        return render_template('_mini_calendar.html', year=year, month=month, today=today, calendar=calendar, date=date,
+                               booking_dates=availability.booked_dates(hall_ids, year, month, hall_versions(hall_ids, year, month)))
+
+    mini_calendar_html = fragments.get(('mini_calendar', year, month, today, state[0]), render_mini_calendar)
 
     # Calculate prev and next
     prev_month = month - 1 if month > 1 else 12
@@ -85,55 +80,102 @@ def index():
     next_month = month + 1 if month < 12 else 1
     next_year = year + 1 if month == 12 else year
 
-    return render_template('index.html', halls=halls, ar_count=ar_count, diamond_count=diamond_count, total_count=total_count, upcoming_ar=upcoming_ar, upcoming_diamond=upcoming_diamond, today=today, calendar=calendar, date=date, Booking=Booking, booking_dates=booking_dates, year=year, month=month, prev_year=prev_year, prev_month=prev_month, next_year=next_year, next_month=next_month, ar_garden=ar_garden, diamond_palace=diamond_palace)
+    return stamp(make_response(render_template('index.html', halls=page_halls, counts=counts, total_count=total_count, upcoming=upcoming, page=page, pages=pages, today=today, calendar=calendar, mini_calendar_html=mini_calendar_html, year=year, month=month, prev_year=prev_year, prev_month=prev_month, next_year=next_year, next_month=next_month)), validator)
 
 @main.route('/hall/<int:hall_id>')
+@query_budget(5)
 def hall(hall_id):
-    hall = Hall.query.get_or_404(hall_id)
+    hall = month_grids.hall(hall_id)
+    if hall is None:
+        abort(404)
     today = current_ist().date()
     year = request.args.get('year', today.year, type=int)
     month = request.args.get('month', today.month, type=int)
-    cal = calendar.monthcalendar(year, month)
-    # Calculate start and end dates for the month
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    all_bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.date >= start_date, Booking.date < end_date).with_entities(Booking.id, Booking.date, Booking.time_slot).all()
-    booking_dict = {(str(b.date), b.time_slot): b for b in all_bookings}
+    state = data_state(year, month, hall_id)
+    validator = page_validator(state, today)
+    cached = not_modified(validator)
+    if cached:
+        return cached
     month_name = calendar.month_name[month]
-    
-    # Optimized: Single query for all stats instead of 5 separate queries
-    stats = db.session.query(
-        func.count(Booking.id).label('total'),
-        func.sum(func.cast(Booking.status == 'confirmed', db.Integer)).label('confirmed'),
-        func.sum(func.cast(Booking.status == 'pending', db.Integer)).label('pending'),
-        func.sum(func.cast(Booking.time_slot == 'day', db.Integer)).label('day'),
-        func.sum(func.cast(Booking.time_slot == 'night', db.Integer)).label('night')
-    ).filter(Booking.hall_id == hall_id, Booking.date >= start_date, Booking.date < end_date).first()
-    
-    return render_template('hall.html', hall=hall, cal=cal, year=year, month=month, month_name=month_name, booking_dict=booking_dict, total=stats.total or 0, confirmed=stats.confirmed or 0, pending=stats.pending or 0, day=stats.day or 0, night=stats.night or 0)
+    month_start, month_end = month_bounds(year, month)
+
+    def render_grid():
+        # Slot occupancy from the availability index at the version read above
+        codes = availability.month_codes(hall_id, year, month, state[0])
+        occupancy = [(bool(code & DAY), bool(code & NIGHT)) for code in codes]
+        return render_template('_hall_grid.html', hall=hall, cal=calendar.monthcalendar(year, month), year=year, month=month,
+                               occupancy=occupancy)
+
+    grid_html = fragments.get(('hall_grid', hall_id, year, month, state[0]), render_grid)
+    # Counters read at the same data version as the ETag
+    grid = month_grids.get(hall_id, year, month, state[0])
+
+    return stamp(make_response(render_template('hall.html', hall=hall, grid_html=grid_html, year=year, month=month, month_name=month_name, month_start=month_start.isoformat(), month_end=(month_end - datetime.timedelta(days=1)).isoformat(), total=grid.total, confirmed=grid.confirmed, pending=grid.pending, day=grid.day, night=grid.night)), validator)
+
+# Longest range one availability request may cover (about three years)
+MAX_AVAILABILITY_DAYS = 1100
+
+@main.route('/api/hall/<int:hall_id>/availability')
+@query_budget(2)
+def hall_availability(hall_id):
+    if month_grids.hall(hall_id) is None:
+        abort(404)
+    today = current_ist().date()
+    try:
+        start_date = date.fromisoformat(request.args.get('from', date(today.year, 1, 1).isoformat()))
+        end_date = date.fromisoformat(request.args.get('to', date(start_date.year, 12, 31).isoformat()))
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD dates'}), 400
+    if end_date < start_date or (end_date - start_date).days >= MAX_AVAILABILITY_DAYS:
+        return jsonify({'error': f'Range must be between 1 and {MAX_AVAILABILITY_DAYS} days'}), 400
+
+    codes = range_codes(hall_id, start_date, end_date)
+    payload = {'hall_id': hall_id, 'from': start_date.isoformat(), 'to': end_date.isoformat(), 'slots': {'day': DAY, 'night': NIGHT}}
+    if request.args.get('encoding') == 'bitmap':
+        # One character per day: 0 free, 1 day booked, 2 night booked, 3 both
+        payload['bitmap'] = ''.join('0123'[c] for c in codes)
+    else:
+        payload['runs'] = encode_runs(codes)
+
+    response = jsonify(payload)
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+@main.route('/hall/<int:hall_id>/year')
+@query_budget(2)
+def hall_year(hall_id):
+    hall = month_grids.hall(hall_id)
+    if hall is None:
+        abort(404)
+    year = request.args.get('year', current_ist().year, type=int)
+    return render_template('hall_year.html', hall=hall, year=year, month_names=calendar.month_name[1:])
+
+@main.route('/hall/<int:hall_id>/slot/<int:year>/<int:month>/<int:day>/<slot>')
+@query_budget(1)
+def slot_booking(hall_id, year, month, day, slot):
+    # Calendar cells only know a slot is taken; resolve the booking on click
+    booking_id = db.session.query(Booking.id).filter_by(hall_id=hall_id, date=date(year, month, day), time_slot=slot).scalar()
+    if booking_id is None:
+        return redirect(url_for('main.book', hall_id=hall_id, year=year, month=month, day=day, slot=slot))
+    return redirect(url_for('main.booking_detail', booking_id=booking_id))
 
 @main.route('/book/<int:hall_id>/<int:year>/<int:month>/<int:day>', methods=['GET', 'POST'])
+@query_budget(7)
 @login_required
 def book(hall_id, year, month, day):
-    hall = Hall.query.get_or_404(hall_id)
+    hall = Hall.query.options(*load_profile('calendar')).get_or_404(hall_id)
     selected_date = date(year, month, day)
+    from app.forms import BookingForm
     form = BookingForm()
     if request.method == 'GET':
         slot = request.args.get('slot')
         if slot:
             form.time_slot.data = slot
     if form.validate_on_submit():
-        # Check if slot is available
-        existing = Booking.query.filter_by(hall_id=hall_id, date=selected_date, time_slot=form.time_slot.data).first()
-        if existing:
-            flash('This slot is already booked')
-            return redirect(url_for('main.hall', hall_id=hall_id))
-        bid = Booking.generate_bid()
-        booking = Booking(
-            bid=bid,
+        # The insert is the availability check: the unique slot constraint
+        # turns away a taken slot, whoever booked it and whenever
+        booking_id = reserve_slot(dict(
             hall_id=hall_id,
             date=selected_date,
             time_slot=form.time_slot.data,
@@ -145,29 +187,112 @@ def book(hall_id, year, month, day):
             advance_paid=form.advance_paid.data,
             balance=form.balance.data,
             total=form.total.data
-        )
-        db.session.add(booking)
-        db.session.commit()
+        ))
+        if booking_id is None:
+            flash('This slot is already booked')
+            return redirect(url_for('main.hall', hall_id=hall_id))
+        month_grids.invalidate(hall_id, selected_date.year, selected_date.month)
         flash('Booking created successfully')
-        return redirect(url_for('main.booking_detail', booking_id=booking.id))
+        return redirect(url_for('main.booking_detail', booking_id=booking_id))
     return render_template('book.html', form=form, hall=hall, date=selected_date)
 
+@main.route('/api/bookings/batch', methods=['POST'])
+@query_budget(8)
+@login_required
+def booking_batch():
+    """Reserve many (hall, date, slot) tuples for one client in one transaction.
+
+    JSON body: client_name, phone, address, optional advance_paid/balance/total,
+    optional atomic (all or nothing) and items, a list of
+    {"hall_id", "date" (YYYY-MM-DD), "time_slot"}. Send the CSRF token of any
+    page form in the X-CSRFToken header.
+    """
+    if current_user.role not in ['user', 'admin']:
+        return jsonify({'error': 'Access denied'}), 403
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        from flask_wtf.csrf import validate_csrf
+        from wtforms.validators import ValidationError
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError:
+            return jsonify({'error': 'Missing or invalid CSRF token'}), 400
+
+    payload = request.get_json(silent=True) or {}
+    details = {key: str(payload.get(key) or '').strip() for key in ('client_name', 'phone', 'address')}
+    missing = [key for key, value in details.items() if not value]
+    items = payload.get('items')
+    if missing:
+        return jsonify({'error': f'Missing {", ".join(missing)}'}), 400
+    if not isinstance(items, list) or not 1 <= len(items) <= BATCH_LIMIT:
+        return jsonify({'error': f'items must be a list of 1 to {BATCH_LIMIT} slots'}), 400
+    try:
+        for key in ('advance_paid', 'balance', 'total'):
+            details[key] = float(payload.get(key) or 0)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'advance_paid, balance and total must be numbers'}), 400
+    details.update(user_id=current_user.id, created_at=current_utc())
+
+    hall_ids = {hall.id for hall in month_grids.halls()}
+    results, slots = [], []
+    for item in items:
+        try:
+            slot = (int(item['hall_id']), date.fromisoformat(item['date']), item['time_slot'])
+        except (KeyError, TypeError, ValueError):
+            results.append({'status': 'invalid', 'error': 'hall_id, date (YYYY-MM-DD) and time_slot are required'})
+            continue
+        result = {'hall_id': slot[0], 'date': slot[1].isoformat(), 'time_slot': slot[2]}
+        if slot[0] not in hall_ids or slot[2] not in ('day', 'night'):
+            result.update(status='invalid', error='Unknown hall or time slot')
+        elif slot in slots:
+            result.update(status='duplicate')
+        else:
+            slots.append(slot)
+            result['slot'] = slot
+        results.append(result)
+
+    atomic = bool(payload.get('atomic'))
+    if atomic and len(slots) < len(items):
+        for result in results:
+            if result.pop('slot', None):
+                result['status'] = 'not_attempted'
+        return jsonify({'created': 0, 'results': results}), 400
+    reserved = reserve_slots(details, slots, atomic=atomic)
+
+    created = 0
+    for result in results:
+        slot = result.pop('slot', None)
+        if slot is None:
+            continue
+        if slot not in reserved:
+            result['status'] = 'not_attempted'
+            continue
+        if reserved[slot] is None:
+            result['status'] = 'booked'
+        else:
+            result.update(status='created', booking_id=reserved[slot][0], bid=reserved[slot][1])
+            month_grids.invalidate(slot[0], slot[1].year, slot[1].month)
+            created += 1
+    return jsonify({'created': created, 'results': results}), 409 if atomic and not created else 200
+
 @main.route('/booking/<int:booking_id>')
+@query_budget(2)
 @login_required
 def booking_detail(booking_id):
-    booking = Booking.query.get_or_404(booking_id)
+    booking = Booking.query.options(*load_profile('detail')).get_or_404(booking_id)
     if current_user.role not in ['user', 'admin']:
         flash('Access denied')
         return redirect(url_for('main.index'))
     return render_template('booking_detail.html', booking=booking)
 
 @main.route('/edit_booking/<int:booking_id>', methods=['GET', 'POST'])
+@query_budget(6)
 @login_required
 def edit_booking(booking_id):
-    booking = Booking.query.get_or_404(booking_id)
+    booking = Booking.query.options(*load_profile('detail')).get_or_404(booking_id)
     if current_user.role not in ['user', 'admin']:
         flash('Access denied')
         return redirect(url_for('main.index'))
+    from app.forms import BookingForm
     form = BookingForm(obj=booking)
     if form.validate_on_submit():
         booking.client_name = form.client_name.data
@@ -177,27 +302,33 @@ def edit_booking(booking_id):
         booking.balance = form.balance.data
         booking.total = form.total.data
         db.session.commit()
+        month_grids.invalidate_booking(booking)
+        receipts.invalidate(booking.id)
         flash('Booking updated')
         return redirect(url_for('main.booking_detail', booking_id=booking.id))
     return render_template('edit_booking.html', form=form, booking=booking)
 
 @main.route('/confirm_booking/<int:booking_id>', methods=['POST'])
+@query_budget(6)
 @login_required
 def confirm_booking(booking_id):
-    booking = Booking.query.get_or_404(booking_id)
+    booking = Booking.query.options(*load_profile('detail')).get_or_404(booking_id)
     if current_user.role not in ['user', 'admin']:
         flash('Access denied')
         return redirect(url_for('main.index'))
     booking.status = 'confirmed'
     booking.confirmed_at = current_utc()
     db.session.commit()
+    month_grids.invalidate_booking(booking)
+    receipts.invalidate(booking.id)
     flash('Booking confirmed')
     return redirect(url_for('main.booking_detail', booking_id=booking.id))
 
 @main.route('/delete_booking/<int:booking_id>', methods=['GET', 'POST'])
+@query_budget(6)
 @login_required
 def delete_booking(booking_id):
-    booking = Booking.query.get_or_404(booking_id)
+    booking = Booking.query.options(*load_profile('detail')).get_or_404(booking_id)
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('main.index'))
@@ -206,291 +337,223 @@ def delete_booking(booking_id):
         if not current_user.check_password(password):
             flash('Invalid password')
             return redirect(url_for('main.delete_booking', booking_id=booking_id))
+        slot = (booking.hall_id, booking.date, booking.time_slot)
         db.session.delete(booking)
         db.session.commit()
+        # Only once the row is gone, so a failed commit leaves the caches right
+        month_grids.invalidate(slot[0], slot[1].year, slot[1].month)
+        receipts.invalidate(booking_id)
         flash('Booking deleted')
         return redirect(url_for('main.index'))
     return render_template('delete_booking.html', booking=booking)
 
 
-@main.route('/hall/<int:hall_id>/bookings/total')
-@login_required
-def hall_bookings_total(hall_id):
-    hall = Hall.query.get_or_404(hall_id)
-    today = current_ist().date()
-    year = request.args.get('year', today.year, type=int)
-    month = request.args.get('month', today.month, type=int)
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.date >= start_date, Booking.date < end_date).all()
-    return render_template('booking_list.html', hall=hall, bookings=bookings, title='Total Bookings', year=year, month=month)
+# Titles for the booking list filters, keyed by status or time slot
+LIST_TITLES = {'confirmed': 'Confirmed Bookings', 'pending': 'Pending Bookings', 'day': 'Day Bookings', 'night': 'Night Bookings'}
 
-@main.route('/hall/<int:hall_id>/bookings/confirmed')
-@login_required
-def hall_bookings_confirmed(hall_id):
-    hall = Hall.query.get_or_404(hall_id)
-    today = current_ist().date()
-    year = request.args.get('year', today.year, type=int)
-    month = request.args.get('month', today.month, type=int)
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.status == 'confirmed', Booking.date >= start_date, Booking.date < end_date).all()
-    return render_template('booking_list.html', hall=hall, bookings=bookings, title='Confirmed Bookings', year=year, month=month)
+def render_booking_list(title, year=None, month=None, hall=None, halls=None, version=None, **filters):
+    """Render one keyset page of booking_list.html for the given filters.
 
-@main.route('/hall/<int:hall_id>/bookings/pending')
-@login_required
-def hall_bookings_pending(hall_id):
-    hall = Hall.query.get_or_404(hall_id)
-    today = current_ist().date()
-    year = request.args.get('year', today.year, type=int)
-    month = request.args.get('month', today.month, type=int)
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.status == 'pending', Booking.date >= start_date, Booking.date < end_date).all()
-    return render_template('booking_list.html', hall=hall, bookings=bookings, title='Pending Bookings', year=year, month=month)
+    With the ``version`` of the month the filters stay within, the table is
+    cached per URL and version, and a hit skips the booking query.
+    """
+    def render_table():
+        after = decode_cursor(request.args.get('after'))
+        bookings, cursor = list_bookings(after=after, **filters)
+        next_url = None
+        if cursor:
+            args = dict(request.args, after=cursor)
+            next_url = url_for(request.endpoint, **request.view_args, **args)
+        receipts_url = url_for('main.batch_receipts', **filter_args(**filters))
+        return render_template('_booking_table.html', bookings=bookings, hall=hall, next_url=next_url, receipts_url=receipts_url)
 
-@main.route('/hall/<int:hall_id>/bookings/day')
+    if version is None:
+        table_html = Markup(render_table())
+    else:
+        table_html = fragments.get(('booking_table', request.full_path, version), render_table)
+    return render_template('booking_list.html', table_html=table_html, title=title, year=year, month=month, hall=hall, halls=halls)
+
+def list_filters():
+    """Booking list filters from the query string: hall, status, slot, from and
+    to. Both dates are inclusive, as in the CSV export and the date pickers;
+    the returned end_date is the day after ``to`` (exclusive)."""
+    hall_id = request.args.get('hall', type=int)
+    if hall_id and month_grids.hall(hall_id) is None:
+        abort(404)
+    try:
+        start_date = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end_date = date.fromisoformat(request.args['to']) + datetime.timedelta(days=1) if request.args.get('to') else None
+    except (ValueError, OverflowError):
+        abort(400)
+    return dict(hall_id=hall_id, status=request.args.get('status') or None, time_slot=request.args.get('slot') or None,
+                start_date=start_date, end_date=end_date)
+
+def filter_args(hall_id=None, status=None, time_slot=None, start_date=None, end_date=None):
+    """The query string list_filters() reads back into the same filters."""
+    args = {'hall': hall_id, 'status': status, 'slot': time_slot,
+            'from': start_date and start_date.isoformat(), 'to': end_date and (end_date - datetime.timedelta(days=1)).isoformat()}
+    return {name: value for name, value in args.items() if value}
+
+@main.route('/bookings')
+@query_budget(3)
 @login_required
-def hall_bookings_day(hall_id):
-    hall = Hall.query.get_or_404(hall_id)
+def bookings():
     today = current_ist().date()
-    year = request.args.get('year', today.year, type=int)
-    month = request.args.get('month', today.month, type=int)
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.time_slot == 'day', Booking.date >= start_date, Booking.date < end_date).all()
-    return render_template('booking_list.html', hall=hall, bookings=bookings, title='Day Bookings', year=year, month=month)
-
-@main.route('/hall/<int:hall_id>/bookings/night')
+    filters = list_filters()
+    hall = month_grids.hall(filters['hall_id']) if filters['hall_id'] else None
+    anchor = filters['start_date'] or today
+    title = LIST_TITLES.get(filters['status']) or LIST_TITLES.get(filters['time_slot']) or 'Total Bookings'
+    return render_booking_list(title, year=anchor.year, month=anchor.month, hall=hall, halls=month_grids.halls(), **filters)
+
+@main.route('/hall/<int:hall_id>/bookings/<kind>')
+@query_budget(1)
 @login_required
-def hall_bookings_night(hall_id):
-    hall = Hall.query.get_or_404(hall_id)
+def hall_bookings(hall_id, kind):
+    # Old per-category URLs, kept for bookmarks
+    if kind not in ('total', 'confirmed', 'pending', 'day', 'night'):
+        abort(404)
     today = current_ist().date()
     year = request.args.get('year', today.year, type=int)
     month = request.args.get('month', today.month, type=int)
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.time_slot == 'night', Booking.date >= start_date, Booking.date < end_date).all()
-    return render_template('booking_list.html', hall=hall, bookings=bookings, title='Night Bookings', year=year, month=month)
+    start_date, end_date = month_bounds(year, month)
+    args = {'hall': hall_id, 'from': start_date.isoformat(), 'to': (end_date - datetime.timedelta(days=1)).isoformat()}
+    if kind in ('confirmed', 'pending'):
+        args['status'] = kind
+    elif kind in ('day', 'night'):
+        args['slot'] = kind
+    return redirect(url_for('main.bookings', **args))
 
 @main.route('/print_receipt/<int:booking_id>')
+@query_budget(2)
 @login_required
 def print_receipt(booking_id):
-    # Lazy import heavy PDF modules only when needed
+    booking = Booking.query.options(*load_profile('detail')).get_or_404(booking_id)
+    if current_user.role not in ['user', 'admin']:
+        flash('Access denied')
+        return redirect(url_for('main.index'))
+
+    # Rendered once per content hash; ReportLab is only imported on a miss
     from io import BytesIO
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib import colors
-    
-    booking = Booking.query.get_or_404(booking_id)
+    pdf, digest = receipts.get(booking)
+    return send_file(BytesIO(pdf), as_attachment=True, download_name=f'receipt_{booking.bid}.pdf', mimetype='application/pdf', etag=digest)
+
+@main.route('/receipts')
+@query_budget(3)
+@login_required
+def batch_receipts():
     if current_user.role not in ['user', 'admin']:
         flash('Access denied')
         return redirect(url_for('main.index'))
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=30, bottomMargin=30, leftMargin=30, rightMargin=30)
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], alignment=1, fontSize=18, fontName='Helvetica-Bold')
-
-    elements = []
-
-    # Convert timestamps to IST
-    created_at_ist = booking.created_at.replace(tzinfo=timezone.utc).astimezone(IST) if booking.created_at.tzinfo is None else booking.created_at.astimezone(IST)
-    confirmed_at_ist = None
-    if booking.confirmed_at:
-        confirmed_at_ist = booking.confirmed_at.replace(tzinfo=timezone.utc).astimezone(IST) if booking.confirmed_at.tzinfo is None else booking.confirmed_at.astimezone(IST)
-
-    # Function to create booking details table
-    def create_booking_table():
-        data = [
-            ['Booking Details', ''],
-            ['BID:', booking.bid],
-            ['Hall:', booking.hall.name],
-            ['Date:', booking.date.strftime('%d %b %Y')],
-            ['Time Slot:', booking.time_slot.title()],
-            ['Client Name:', booking.client_name],
-            ['Phone:', booking.phone],
-            ['Address:', booking.address],
-            ['Status:', booking.status.title()],
-            ['Booked on:', created_at_ist.strftime('%d %b %Y at %I:%M %p')],
-        ]
-        if confirmed_at_ist:
-            data.append(['Confirmed on:', confirmed_at_ist.strftime('%d %b %Y at %I:%M %p')])
-
-        style_commands = [
-            ('SPAN', (0, 0), (1, 0)),  # Merge header row
-            ('BACKGROUND', (0, 0), (1, 0), colors.lightgrey),  # Header row
-            ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (1, 0), 10),
-            ('ALIGN', (0, 0), (1, 0), 'CENTER'),  # Center the merged header
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (1, 1), (1, 1), 'Helvetica-Bold'),  # Bold BID
-            # Highlight Hall
-            ('BACKGROUND', (0, 2), (-1, 2), colors.lightgrey),
-            ('FONTNAME', (0, 2), (1, 2), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 2), (1, 2), 10),
-            # Highlight Date
-            ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
-            ('FONTNAME', (0, 3), (1, 3), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 3), (1, 3), 10),
-        ]
-
-        table = Table(data, colWidths=[120, 300])
-        table.setStyle(TableStyle(style_commands))
-        return table
-
-    # Function to create payment table
-    def create_payment_table():
-        payment_data = [
-            ['Payment Information', ''],
-            ['Total:', f'{booking.total or 0:.2f}'],
-            ['Advance Paid:', f'{booking.advance_paid or 0:.2f}'],
-            ['Balance:', f'{booking.balance or 0:.2f}'],
-        ]
-        payment_table = Table(payment_data, colWidths=[120, 300])
-        payment_table.setStyle(TableStyle([
-            ('SPAN', (0, 0), (1, 0)),  # Merge header row
-            ('BACKGROUND', (0, 0), (1, 0), colors.lightgrey),  # Header row
-            ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (1, 0), 10),
-            ('ALIGN', (0, 0), (1, 0), 'CENTER'),  # Center the merged header
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (1, 1), (1, -1), 'Helvetica-Bold'),  # Bold the amount column
-        ]))
-        return payment_table
-
-    # Company Copy
-    elements.append(create_booking_table())
-    elements.append(Spacer(1, 10))
-    elements.append(create_payment_table())
-    elements.append(Spacer(1, 15))
-
-    # Line break
-    line_table = Table([['']], colWidths=[420])
-    line_table.setStyle(TableStyle([
-        ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(line_table)
-    elements.append(Spacer(1, 15))
-
-    # Customer Copy
-    elements.append(create_booking_table())
-    elements.append(Spacer(1, 10))
-    elements.append(create_payment_table())
-
-    doc.build(elements)
-    buffer.seek(0)
-
-    from flask import send_file
-    return send_file(buffer, as_attachment=True, download_name=f'receipt_{booking.bid}.pdf', mimetype='application/pdf')
+    # ?ids=1,2,3 or the /bookings filters; format=pdf (one document) or zip (one file per receipt)
+    if request.args.get('ids'):
+        try:
+            ids = [int(part) for part in request.args['ids'].split(',')]
+        except ValueError:
+            abort(400)
+        selected = receipt_bookings(ids=ids)
+    else:
+        selected = receipt_bookings(**list_filters())
+    if not selected:
+        flash('No bookings to print')
+        return redirect(request.referrer or url_for('main.index'))
+    if len(selected) > MAX_BATCH:
+        flash(f'More than {MAX_BATCH} receipts selected; narrow the filter')
+        return redirect(request.referrer or url_for('main.index'))
+
+    from io import BytesIO
+    from flask import Response, stream_with_context
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if request.args.get('format') == 'zip':
+        # Entries go out as they are rendered; the PDFs themselves are not recompressed
+        return Response(
+            stream_with_context(iter_zip(receipts.pdfs(selected))),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename=receipts_{timestamp}.zip'}
+        )
+    # One document build in this thread, sent whole (see combined_pdf)
+    return send_file(BytesIO(combined_pdf(selected)), as_attachment=True, download_name=f'receipts_{timestamp}.pdf', mimetype='application/pdf')
 
 @main.route('/export_csv')
+# Rows are read while the response streams, after the budget check
+@query_budget(1)
 @login_required
 def export_csv():
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('main.index'))
 
-    import csv
-    from io import StringIO
-
-    si = StringIO()
-    writer = csv.writer(si)
-
-    # Write header
-    writer.writerow(['BID', 'Hall', 'Date', 'Time Slot', 'Client Name', 'Phone', 'Address', 'Status', 'Booked On', 'Confirmed On', 'Advance Paid', 'Balance', 'Total'])
-
-    # Write data - use yield_per for memory-efficient streaming of large datasets
-    query = Booking.query.options(db.joinedload(Booking.hall)).order_by(Booking.date).yield_per(100)
-    for booking in query:
-        created_at_ist = booking.created_at.replace(tzinfo=timezone.utc).astimezone(IST) if booking.created_at and booking.created_at.tzinfo is None else (booking.created_at.astimezone(IST) if booking.created_at else None)
-        confirmed_at_ist = booking.confirmed_at.replace(tzinfo=timezone.utc).astimezone(IST) if booking.confirmed_at and booking.confirmed_at.tzinfo is None else (booking.confirmed_at.astimezone(IST) if booking.confirmed_at else None)
-        writer.writerow([
-            booking.bid,
-            booking.hall.name,
-            booking.date.strftime('%d %b %Y'),
-            booking.time_slot.title(),
-            booking.client_name,
-            booking.phone,
-            booking.address,
-            booking.status.title(),
-            created_at_ist.strftime('%d %b %Y %H:%M') if created_at_ist else '',
-            confirmed_at_ist.strftime('%d %b %Y %H:%M') if confirmed_at_ist else '',
-            booking.advance_paid or 0,
-            booking.balance or 0,
-            booking.total or 0
-        ])
-
-    output = si.getvalue()
-    si.close()
+    from flask import Response, stream_with_context
+    from app.exports import export_query, iter_csv, iter_gzip
+
+    # Optional filters: from/to (inclusive dates), hall id and status
+    try:
+        start_date = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end_date = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        flash('Invalid export date range')
+        return redirect(url_for('main.admin_utils'))
+    query = export_query(start_date, end_date, request.args.get('hall', type=int), request.args.get('status') or None)
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f'client_bookings_{timestamp}.csv'
 
-    from flask import Response
+    # Rows go to the socket as they are produced instead of being buffered
+    chunks = iter_csv(query)
+    mimetype = 'text/csv'
+    if request.args.get('gzip'):
+        chunks = iter_gzip(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
     return Response(
-        output,
-        mimetype='text/csv',
+        stream_with_context(chunks),
+        mimetype=mimetype,
         headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
+def conditional_list(title, year, month, hall_id=None, **kwargs):
+    """render_booking_list behind a data-version validator: a revalidation
+    with nothing changed in the month costs one query and no rendering."""
+    state = data_state(year, month, hall_id)
+    validator = page_validator(state)
+    cached = not_modified(validator)
+    if cached:
+        return cached
+    if hall_id is not None:
+        kwargs['hall_id'] = hall_id
+    return stamp(make_response(render_booking_list(title, year=year, month=month, version=state[0], **kwargs)), validator)
+
 @main.route('/date/<int:year>/<int:month>/<int:day>')
+@query_budget(3)
 def date_bookings(year, month, day):
     selected_date = date(year, month, day)
-    bookings = Booking.query.filter(Booking.date == selected_date).order_by(Booking.hall_id, Booking.time_slot).all()
-    halls = Hall.query.all()
-    return render_template('booking_list.html', bookings=bookings, title=f'Bookings for {selected_date.strftime("%d %b %Y")}', year=year, month=month, hall=None, halls=halls)
+    title = f'Bookings for {selected_date.strftime("%d %b %Y")}'
+    return conditional_list(title, year, month, halls=month_grids.halls(), start_date=selected_date, end_date=selected_date + datetime.timedelta(days=1))
 
 @main.route('/monthly/total/<int:year>/<int:month>')
+@query_budget(3)
 def monthly_bookings_total(year, month):
-    start_date = date(year, month, 1)
-    end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.date >= start_date, Booking.date < end_date).order_by(Booking.date, Booking.hall_id, Booking.time_slot).all()
+    start_date, end_date = month_bounds(year, month)
     title = f'Total Bookings for {start_date.strftime("%B %Y")}'
-    halls = Hall.query.all()
-    return render_template('booking_list.html', bookings=bookings, title=title, year=year, month=month, hall=None, halls=halls)
+    return conditional_list(title, year, month, halls=month_grids.halls(), start_date=start_date, end_date=end_date)
 
 @main.route('/monthly/hall/<int:hall_id>/<int:year>/<int:month>')
+@query_budget(3)
 def monthly_hall_bookings(hall_id, year, month):
-    hall = Hall.query.get_or_404(hall_id)
-    start_date = date(year, month, 1)
-    end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
-    bookings = Booking.query.filter(Booking.hall_id == hall_id, Booking.date >= start_date, Booking.date < end_date).order_by(Booking.date, Booking.time_slot).all()
+    hall = month_grids.hall(hall_id)
+    if hall is None:
+        abort(404)
+    start_date, end_date = month_bounds(year, month)
     title = f'{hall.name} Bookings for {start_date.strftime("%B %Y")}'
-    return render_template('booking_list.html', bookings=bookings, title=title, year=year, month=month, hall=hall)
+    return conditional_list(title, year, month, hall_id, hall=hall, start_date=start_date, end_date=end_date)
 
 @main.route('/search', methods=['GET', 'POST'])
+@query_budget(5)
 def search():
-    if request.method == 'POST':
-        query = request.form.get('query').strip()
+    # POST comes from the search forms, GET ?q=&page= from result pagination
+    query = (request.form.get('query') if request.method == 'POST' else request.args.get('q')) or ''
+    query = query.strip()
+    if query:
         # Check if query is "Month Year"
         parts = query.split()
         if len(parts) == 2:
@@ -500,142 +563,139 @@ def search():
                 month = next((i for i, name in enumerate(calendar.month_name) if name and name.lower() == month_str.lower()), None)
                 if month:
                     # Valid month year
-                    start_date = date(year, month, 1)
-                    end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
-                    bookings = Booking.query.filter(Booking.date >= start_date, Booking.date < end_date).order_by(Booking.date, Booking.hall_id, Booking.time_slot).all()
-                    title = f'Bookings for {month_str} {year}'
-                    halls = Hall.query.all()
-                    return render_template('booking_list.html', bookings=bookings, title=title, year=year, month=month, hall=None, halls=halls)
+                    return redirect(url_for('main.monthly_bookings_total', year=year, month=month))
             except ValueError:
                 pass
         # Check if query is a hall name
-        halls = Hall.query.all()
+        halls = month_grids.halls()
         hall_match = next((h for h in halls if h.name.lower() == query.lower()), None)
         if hall_match:
-            bookings = Booking.query.filter(Booking.hall_id == hall_match.id).order_by(Booking.date, Booking.time_slot).all()
-            title = f'Bookings for {hall_match.name}'
-            return render_template('booking_list.html', bookings=bookings, title=title, hall=hall_match)
-        # Normal search
-        bookings = Booking.query.filter(
-            (Booking.bid.ilike(f'%{query}%')) |
-            (Booking.client_name.ilike(f'%{query}%')) |
-            (Booking.phone.ilike(f'%{query}%'))
-        ).all()
-        return render_template('search_results.html', bookings=bookings, query=query)
+            # Listed right here: /bookings needs a login, public search does not.
+            # Forms are sent on as GET ?q= so the list's next-page links keep the query
+            if request.method == 'POST':
+                return redirect(url_for('main.search', q=query))
+            return render_booking_list(f'Bookings for {hall_match.name}', hall=hall_match, halls=month_grids.halls(),
+                                       hall_id=hall_match.id)
+        # Normal search: exact BID, then ranked name/phone matches
+        results = search_bookings(query, request.args.get('page', 1, type=int))
+        return render_template('search_results.html', bookings=results.bookings, results=results, query=query)
+    from app.forms import SearchForm
     form = SearchForm()
     return render_template('search.html', form=form)
 
 @main.route('/admin/utils')
+@query_budget(2)
 @login_required
 def admin_utils():
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('main.index'))
+    from app.forms import BackupForm
     backup_form = BackupForm()
-    return render_template('admin_utils.html', backup_form=backup_form)
+    return render_template('admin_utils.html', backup_form=backup_form, halls=month_grids.halls())
+
+@main.route('/admin/finance')
+@query_budget(3)
+@login_required
+def admin_finance():
+    """Billed, collected and outstanding amounts per hall and month with the
+    year before alongside, read from booking_rollup."""
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('main.index'))
+    year = request.args.get('year', current_ist().year, type=int)
+    status = request.args.get('status') if request.args.get('status') in ('confirmed', 'pending') else None
+    report = finance_report(month_grids.halls(), year, status)
+    return render_template('finance.html', report=report, year=year, status=status, change=change,
+                           month_names=list(calendar.month_abbr))
+
+@main.route('/admin/cache_stats')
+@query_budget(1)
+@login_required
+def admin_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify({'month_grids': month_grids.stats(), 'availability': availability.stats(), 'receipts': receipts.stats(),
+                    'fragments': fragments.stats(), 'identities': identities.stats(), 'warmup': process_warmup.stats()})
 
 @main.route('/admin/backup', methods=['POST'])
+@query_budget(5)
 @login_required
 def admin_backup():
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('main.index'))
     
-    # Lazy import heavy database engine modules only when needed
-    from sqlalchemy import create_engine, text, MetaData
-    from io import BytesIO
-    
-    DATABASE_URL = os.getenv('DATABASE_URL').replace('postgresql://', 'postgresql+pg8000://')
-    engine = create_engine(DATABASE_URL)
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
+    from app.forms import BackupForm
+    form = BackupForm()
+    since = None
+    if form.since.data:
+        try:
+            since = datetime.datetime.fromisoformat(form.since.data.strip())
+        except ValueError:
+            flash('Incremental backups need an ISO date/time, e.g. 2026-01-31T18:00')
+            return redirect(url_for('main.admin_utils'))
+        # The form takes IST; stored timestamps are naive UTC
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=IST)
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    # Lazy import heavy modules only when needed
+    from tempfile import SpooledTemporaryFile
+    from zipfile import ZipFile
+    from app.backup import write_backup, schema_sql
+    from app.dbaccess import connection
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # Export data to JSON
-    data = {}
-    with engine.connect() as conn:
-        for table_name in ['user', 'hall', 'booking']:
-            result = conn.execute(text(f'SELECT json_agg(row_to_json("{table_name}")) FROM "{table_name}"'))
-            table_data = result.fetchone()[0]
-            data[table_name] = table_data or []
-
-    # Create in-memory files
-    from io import BytesIO
-    from zipfile import ZipFile
-
-    # Data JSON
-    data_content = json.dumps(data, indent=2).encode('utf-8')
-
-    # Schema SQL - only user tables
-    schema_sql = ""
-    user_tables = ['user', 'hall', 'booking']
-    for table in metadata.sorted_tables:
-        if table.name in user_tables:
-            schema_sql += str(table) + ";\n\n"
-    schema_content = schema_sql.encode('utf-8')
-
-    # Create ZIP in memory
-    zip_buffer = BytesIO()
-    with ZipFile(zip_buffer, 'w') as zipf:
-        zipf.writestr(f'backup_data_{timestamp}.json', data_content)
-        zipf.writestr(f'backup_schema_{timestamp}.sql', schema_content)
+    # Rows are streamed from a server-side cursor into a gzip entry; the archive
+    # only leaves memory for a temp file once it grows past a few megabytes
+    zip_buffer = SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    with connection() as (conn, timer), ZipFile(zip_buffer, 'w') as zipf:
+        # The entry is already gzip-compressed, so it is stored as-is
+        with zipf.open(f'backup_data_{timestamp}.ndjson.gz', 'w') as data_entry:
+            counts = write_backup(conn, data_entry, since)
+        zipf.writestr(f'backup_schema_{timestamp}.sql', schema_sql(conn, db.metadata))
     zip_buffer.seek(0)
+    current_app.logger.info('Backup of %s rows: %s', sum(counts.values()), timer)
 
-    zip_filename = f'backup_{timestamp}.zip'
+    kind = 'incremental' if since else 'full'
+    zip_filename = f'backup_{kind}_{timestamp}.zip'
     return send_file(zip_buffer, as_attachment=True, download_name=zip_filename, mimetype='application/zip')
 
 @main.route('/admin/restore', methods=['GET', 'POST'])
+# The restore itself is uncounted: its batches grow with the backup
+@query_budget(3)
 @login_required
 def admin_restore():
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('main.index'))
+    from app.forms import RestoreForm
     form = RestoreForm()
     if form.validate_on_submit():
         schema_file = form.schema_file.data
         data_file = form.data_file.data
 
         try:
-            # Lazy import heavy database engine modules only when needed
-            from sqlalchemy import create_engine, text
-            
-            # Read files into memory
+            # Lazy import heavy modules only when needed
+            from app.restore import restore_backup
+            from app.dbaccess import connection, existing_tables
+
             schema_content = schema_file.read().decode('utf-8')
-            data_content = data_file.read().decode('utf-8')
-            data = json.loads(data_content)
-
-            DATABASE_URL = os.getenv('DATABASE_URL').replace('postgresql://', 'postgresql+pg8000://')
-            engine = create_engine(DATABASE_URL)
-
-            # Restore schema - only user tables
-            with engine.connect() as conn:
-                statements = [stmt.strip() for stmt in schema_content.split(';') if stmt.strip()]
-                for stmt in statements:
-                    if stmt and ('CREATE TABLE "user"' in stmt or 'CREATE TABLE "hall"' in stmt or 'CREATE TABLE "booking"' in stmt):
-                        conn.execute(text(stmt))
-                conn.commit()
-
-            # Restore data - delete in reverse dependency order, insert in dependency order
-            with engine.connect() as conn:
-                # Delete in reverse order
-                delete_order = ['booking', 'user', 'hall']
-                for table_name in delete_order:
-                    if table_name in data and data[table_name]:
-                        conn.execute(text(f'DELETE FROM "{table_name}"'))
-
-                # Insert in dependency order
-                insert_order = ['hall', 'user', 'booking']
-                for table_name in insert_order:
-                    if table_name in data and data[table_name]:
-                        for row in data[table_name]:
-                            columns = ', '.join(f'"{k}"' for k in row.keys())
-                            placeholders = ', '.join([f':{k}' for k in row.keys()])
-                            insert_sql = f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'
-                            conn.execute(text(insert_sql), row)
-                conn.commit()
-
-            flash('Database restored successfully')
+
+            # Single transaction; the data file is streamed and inserted in batches
+            with uncounted(), connection(begin=True) as (conn, timer):
+                counts, seconds = restore_backup(conn, schema_content, data_file.stream, existing=existing_tables(conn))
+
+            month_grids.clear()
+            availability.clear()
+            allocator.reset()
+            receipts.clear()
+            fragments.clear()
+            identities.clear()
+            total = sum(counts.values())
+            flash(f'Database restored successfully: {total} rows in {seconds:.1f}s ({total / seconds if seconds else 0:.0f} rows/s; {timer})')
         except Exception as e:
             flash(f'Restore failed: {str(e)}')
 
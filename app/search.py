@@ -0,0 +1,104 @@
+import re
+from collections import namedtuple
+
+from sqlalchemy import case, func, or_, text
+
+from app import db
+from app.models import Booking, Hall, normalize_phone
+from app.listing import LIST_COLUMNS
+
+PER_PAGE = 25
+# Searches never page past this many results; refine the query instead
+MAX_RESULTS = 200
+
+MIN_PHONE_DIGITS = 3
+BID_PATTERN = re.compile(r'^\d{6}$')
+
+SearchPage = namedtuple('SearchPage', ['bookings', 'page', 'has_next', 'capped'])
+
+_fts_available = None
+
+
+def _has_fts():
+    """Whether the SQLite FTS5 shadow table from the search migration exists."""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'booking_fts'")).first() is not None
+    return _fts_available
+
+
+def _list_query():
+    return db.session.query(*LIST_COLUMNS).join(Hall, Booking.hall_id == Hall.id)
+
+
+def _fts_match(query, digits):
+    # Every word must match as a prefix; numbers are matched as one digit run
+    terms = [f'"{t}"*' for t in re.findall(r'\w+', query) if not (digits and t.isdigit())]
+    if digits:
+        terms.append(f'"{digits}"*')
+    return ' '.join(terms)
+
+
+def _search_sqlite(query, digits, limit, offset):
+    match = _fts_match(query, digits)
+    if not match:
+        return []
+    ranked = db.session.execute(
+        text('SELECT rowid FROM booking_fts WHERE booking_fts MATCH :match ORDER BY bm25(booking_fts) LIMIT :limit OFFSET :offset'),
+        {'match': match, 'limit': limit, 'offset': offset}).scalars().all()
+    if not ranked:
+        return []
+    rows = {row.id: row for row in _list_query().filter(Booking.id.in_(ranked))}
+    return [rows[i] for i in ranked if i in rows]
+
+
+def _search_postgres(query, digits, limit, offset):
+    # lower(client_name) and phone_digits LIKE '%q%' are served by the pg_trgm GIN indexes
+    name = func.lower(Booking.client_name)
+    predicates = [name.contains(query.lower(), autoescape=True), Booking.bid.startswith(query, autoescape=True)]
+    if digits:
+        predicates.append(Booking.phone_digits.contains(digits, autoescape=True))
+    return _list_query().filter(or_(*predicates)).order_by(
+        func.similarity(name, query.lower()).desc(), Booking.date.desc(), Booking.id).limit(limit).offset(offset).all()
+
+
+def _search_prefix(query, digits, limit, offset):
+    # Databases without the search migration: prefix matches only
+    predicates = [Booking.bid.startswith(query, autoescape=True), Booking.client_name.istartswith(query, autoescape=True)]
+    if digits:
+        predicates.append(Booking.phone_digits.startswith(digits, autoescape=True))
+    exact_name = case((func.lower(Booking.client_name) == query.lower(), 0), else_=1)
+    return _list_query().filter(or_(*predicates)).order_by(exact_name, Booking.date.desc(), Booking.id).limit(limit).offset(offset).all()
+
+
+def search_bookings(query, page=1):
+    """Ranked, capped page of bookings matching a BID, client name or phone."""
+    query = query.strip()
+    page = max(page, 1)
+    offset = (page - 1) * PER_PAGE
+    if not query or offset >= MAX_RESULTS:
+        return SearchPage([], page, False, offset >= MAX_RESULTS)
+
+    # Exact BID fast path: a unique index lookup, no ranking needed
+    if BID_PATTERN.match(query):
+        exact = _list_query().filter(Booking.bid == query).first()
+        if exact is not None:
+            return SearchPage([exact] if page == 1 else [], page, False, False)
+
+    # Treat the digits as a phone number only when there are enough of them
+    digits = normalize_phone(query)
+    if len(digits) < MIN_PHONE_DIGITS:
+        digits = ''
+    limit = PER_PAGE + 1
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        rows = _search_postgres(query, digits, limit, offset)
+    elif dialect == 'sqlite' and _has_fts():
+        rows = _search_sqlite(query, digits, limit, offset)
+    else:
+        rows = _search_prefix(query, digits, limit, offset)
+
+    has_more = len(rows) > PER_PAGE
+    last_page = offset + PER_PAGE >= MAX_RESULTS
+    return SearchPage(rows[:PER_PAGE], page, has_more and not last_page, has_more and last_page)
@@ -0,0 +1,103 @@
+import importlib
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.availability import availability
+from app.calendar_cache import month_grids
+from app.data_versions import hall_versions
+from app.instrumentation import uncounted
+from app.models import current_ist, current_utc
+
+# Templates behind the dashboard, hall calendar and booking lists
+TEMPLATES = ('base.html', 'index.html', 'hall.html', 'booking_list.html', '_mini_calendar.html', '_hall_grid.html',
+             '_booking_table.html')
+# Imported on first use by their views (see SERVERLESS); warmup loads them early
+MODULES = ('app.receipt_pdf', 'app.forms')
+
+
+def fill_pool():
+    """Open every idle pooled connection once so the first requests skip the connect.
+
+    The pings grow with DB_POOL_SIZE, so they stay out of the view's query budget.
+    """
+    pool = db.engine.pool
+    size = pool.size() - pool.checkedout() if hasattr(pool, 'size') else 1
+    connections = []
+    try:
+        with uncounted():
+            for _ in range(size):
+                conn = db.engine.connect()
+                conn.execute(text('SELECT 1'))
+                connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
+    return size
+
+
+def compile_templates():
+    for name in TEMPLATES:
+        current_app.jinja_env.get_template(name)
+    return len(TEMPLATES)
+
+
+def prefetch_calendar():
+    """Hall list and this month's grids and occupancy, at their data versions,
+    into month_grids and the availability index."""
+    today = current_ist().date()
+    hall_ids = [hall.id for hall in month_grids.halls()]
+    versions = hall_versions(hall_ids, today.year, today.month)
+    month_grids.get_many(hall_ids, today.year, today.month, versions)
+    availability.months(hall_ids, today.year, today.month, versions)
+    return len(hall_ids)
+
+
+def import_modules():
+    for name in MODULES:
+        importlib.import_module(name)
+    return len(MODULES)
+
+
+STAGES = (('pool', fill_pool), ('templates', compile_templates), ('calendar', prefetch_calendar),
+          ('imports', import_modules))
+
+
+class Warmup:
+    """Primes the per-process hot paths once and remembers how long each stage took.
+
+    A failed stage leaves the process unwarmed, so the next ping tries again.
+    """
+
+    def __init__(self):
+        self.report = None
+        self.pings = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        """(report, first) where ``first`` says whether this call did the work."""
+        with self._lock:
+            self.pings += 1
+            if self.report is not None:
+                return self.report, False
+            started = time.perf_counter()
+            stages = {}
+            for name, stage in STAGES:
+                stage_started = time.perf_counter()
+                result = stage()
+                stages[name] = {'ms': round((time.perf_counter() - stage_started) * 1000, 2)}
+                if result is not None:
+                    stages[name]['count'] = result
+            self.report = {'warmed_at': current_utc().isoformat(), 'total_ms': round((time.perf_counter() - started) * 1000, 2),
+                           'stages': stages}
+            return self.report, True
+
+    def stats(self):
+        with self._lock:
+            return {'pings': self.pings, 'report': self.report}
+
+
+warmup = Warmup()
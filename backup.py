@@ -1,40 +1,34 @@
-import os
-import json
+import argparse
 import datetime
-from sqlalchemy import create_engine, text, MetaData
-from app.models import db, User, Hall, Booking  # Import models
+from app import db
+from app.backup import write_backup, schema_sql
+from app.dbaccess import connection, create_script_app
 
-# Load DATABASE_URL from .env
-DATABASE_URL = os.getenv('DATABASE_URL').replace('postgresql://', 'postgresql+pg8000://')
-
-def backup_database():
-    engine = create_engine(DATABASE_URL)
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
+def backup_database(since=None):
+    app = create_script_app()
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    data_path = f'backup_data_{timestamp}.ndjson.gz'
+    schema_path = f'backup_schema_{timestamp}.sql'
 
-    # Export data to JSON
-    data = {}
-    with engine.connect() as conn:
-        for table_name in ['user', 'hall', 'booking']:
-            result = conn.execute(text(f'SELECT json_agg(row_to_json("{table_name}")) FROM "{table_name}"'))
-            table_data = result.fetchone()[0]
-            data[table_name] = table_data or []
-
-    # Save data to JSON
-    with open(f'backup_data_{timestamp}.json', 'w') as f:
-        json.dump(data, f, indent=2)
+    def progress(table_name, count):
+        print(f"  {table_name}: {count} rows")
 
-    # Export schema to SQL (DDL)
-    schema_sql = ""
-    for table in metadata.sorted_tables:
-        schema_sql += str(table) + ";\n\n"
+    # Stream rows straight to a gzip-compressed NDJSON file
+    with app.app_context(), connection() as (conn, timer):
+        with open(data_path, 'wb') as f:
+            counts = write_backup(conn, f, since, progress)
 
-    with open(f'backup_schema_{timestamp}.sql', 'w') as f:
-        f.write(schema_sql)
+        # Export schema to SQL (DDL)
+        with open(schema_path, 'w') as f:
+            f.write(schema_sql(conn, db.metadata))
 
-    print(f"Backup completed: backup_data_{timestamp}.json and backup_schema_{timestamp}.sql")
+    summary = ', '.join(f"{name}: {count}" for name, count in counts.items())
+    print(f"Backup completed: {data_path} and {schema_path} ({summary}; {timer})")
 
 if __name__ == "__main__":
-    backup_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Back up the database to gzip-compressed NDJSON.')
+    parser.add_argument('--since', type=datetime.datetime.fromisoformat,
+                        help='incremental: only bookings created or confirmed since this UTC time (the watermark of the previous backup)')
+    args = parser.parse_args()
+    backup_database(args.since)
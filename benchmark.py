@@ -0,0 +1,1276 @@
+"""Benchmarks run against a throwaway SQLite database (the suite can also seed an empty PostgreSQL one).
+
+Usage:
+    python benchmark.py restore [--bookings 100000]
+    python benchmark.py bids [--fills 10,50,90] [--samples 200]
+    python benchmark.py slots [--requests 400] [--threads 32]
+    python benchmark.py batch [--sizes 1,10,50,100] [--bookings 1000]
+    python benchmark.py receipts [--samples 200]
+    python benchmark.py batch-receipts [--bookings 60] [--workers N]
+    python benchmark.py imports [--runs 5] [--budget-ms 1000] [--profile importtime.txt]
+    python benchmark.py warmup [--runs 3]
+    python benchmark.py suite [--scale 1k|100k|1m] [--database URL] [--cold] [--output results.json]
+    python benchmark.py finance [--scale 1k|100k|1m] [--samples 20]
+    python benchmark.py revalidate [--scale 1k|100k|1m] [--samples 50]
+    python benchmark.py fragments [--scale 1k|100k|1m] [--samples 50]
+    python benchmark.py dashboard [--halls 2,20,200] [--bookings-per-hall 500] [--samples 30]
+    python benchmark.py identity [--samples 200]
+    python benchmark.py ranges [--samples 50]
+    python benchmark.py export-memory [--counts 10000,100000,990000] [--gzip] [--slack-mb 16]
+    python benchmark.py scans [--scale 1k|100k|1m] [--samples 10]
+    python benchmark.py compare base.json new.json
+    python benchmark.py load [--sessions 16] [--duration 20] [--pool-sizes 2,4,8] [--days 30]
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_app(db_path, url=None):
+    """App bound to a fresh SQLite file (or ``url``) with the current schema."""
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['DATABASE_URL'] = url or f'sqlite:///{db_path}'
+    from app import create_app, db
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def write_backup(fp, bookings, halls=2, users=5):
+    """Write a synthetic backup in the admin_backup JSON layout."""
+    fp.write('{"user": [')
+    fp.write(', '.join(json.dumps({'id': i, 'username': f'user{i}', 'name': f'User {i}', 'password_hash': 'x', 'role': 'user'})
+                       for i in range(1, users + 1)))
+    fp.write('], "hall": [')
+    fp.write(', '.join(json.dumps({'id': i, 'name': f'Hall {i}'}) for i in range(1, halls + 1)))
+    fp.write('], "booking": [')
+    start = datetime.date(2026, 1, 1)
+    for i in range(bookings):
+        # One booking per (hall, day, slot) so the rows stay valid under slot uniqueness
+        slot_index, hall_index = divmod(i, halls)
+        day, slot = divmod(slot_index, 2)
+        row = {
+            'id': i + 1, 'bid': f'{i:06d}', 'hall_id': hall_index + 1, 'date': (start + datetime.timedelta(days=day)).isoformat(),
+            'time_slot': ('day', 'night')[slot], 'client_name': f'Client {i}', 'phone': f'98{random.randrange(10 ** 8):08d}',
+            'address': 'Synthetic address', 'status': random.choice(('pending', 'confirmed')), 'user_id': random.randint(1, users),
+            'created_at': '2026-01-01T10:00:00', 'confirmed_at': None, 'advance_paid': 1000.0, 'balance': 4000.0, 'total': 5000.0,
+        }
+        fp.write((', ' if i else '') + json.dumps(row))
+    fp.write(']}')
+
+
+def bench_restore(args):
+    from app.dbaccess import connection
+    from app.restore import restore_backup
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        data_path = os.path.join(tmp, 'backup.json')
+        with open(data_path, 'w') as fp:
+            write_backup(fp, args.bookings)
+        with app.app_context(), open(data_path, 'rb') as fp, connection(begin=True) as (conn, timer):
+            counts, seconds = restore_backup(conn, '', fp)
+    total = sum(counts.values())
+    return {'rows': counts, 'seconds': round(seconds, 3), 'rows_per_second': round(total / seconds)}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def latency_summary(seconds):
+    return {'p50_ms': round(percentile(seconds, 50) * 1000, 3), 'p95_ms': round(percentile(seconds, 95) * 1000, 3)}
+
+
+def legacy_generate_bid(counter):
+    """The random-probe BID generator the allocator replaced."""
+    from app.models import Booking
+    while True:
+        counter[0] += 1
+        bid = ''.join(random.choices('0123456789', k=6))
+        if not Booking.query.filter_by(bid=bid).first():
+            return bid
+
+
+def bench_bids(args):
+    from sqlalchemy import text
+    from app import db
+    from app.bids import BID_SPACE, allocator, scramble
+    from app.models import Booking
+    from app.reservations import reserve_slot
+
+    fills = [int(f) for f in args.fills.split(',')]
+    start = datetime.date(2026, 1, 1)
+    slots = iter(range(10 ** 7))
+
+    def new_booking(client_name='Bench'):
+        # Each booking gets its own (hall 1, day, slot)
+        day, slot = divmod(next(slots), 2)
+        return dict(hall_id=1, date=start + datetime.timedelta(days=day), time_slot=('day', 'night')[slot],
+                    client_name=client_name, phone='9800000000', address='Synthetic address', user_id=1)
+
+    def seed_to(conn, target):
+        # Advance the counter and insert the BIDs the allocator would have issued
+        current = conn.execute(text("SELECT next_value FROM bid_sequence WHERE name = 'booking'")).scalar()
+        conn.execute(text("UPDATE bid_sequence SET next_value = :n WHERE name = 'booking'"), {'n': target})
+        sql = text('INSERT INTO booking (bid, hall_id, date, time_slot, client_name, phone, address, status, user_id, created_at) '
+                   "VALUES (:bid, 2, :date, :slot, 'Seed', '9800000000', 'Synthetic address', 'pending', 1, '2026-01-01 10:00:00')")
+        for batch_start in range(current, target, 10000):
+            conn.execute(sql, [{'bid': f'{scramble(c):06d}', 'date': start + datetime.timedelta(days=c // 2), 'slot': ('day', 'night')[c % 2]}
+                               for c in range(batch_start, min(batch_start + 10000, target))])
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.session.execute(text("INSERT INTO user (username, name, password_hash, role) VALUES ('bench', 'Bench', 'x', 'user')"))
+            db.session.execute(text("INSERT INTO hall (name) VALUES ('Hall 1'), ('Hall 2')"))
+            db.session.commit()
+            for fill in fills:
+                with db.engine.begin() as conn:
+                    seed_to(conn, BID_SPACE * fill // 100)
+                allocator.reset()
+                timings = []
+                for _ in range(args.samples):
+                    started = time.perf_counter()
+                    reserve_slot(new_booking())
+                    timings.append(time.perf_counter() - started)
+                probe_timings, probes = [], [0]
+                for _ in range(args.samples):
+                    started = time.perf_counter()
+                    # The old route: slot SELECT, BID probe loop, then the insert
+                    values = new_booking('Probe')
+                    Booking.query.filter_by(hall_id=values['hall_id'], date=values['date'], time_slot=values['time_slot']).first()
+                    db.session.add(Booking(bid=legacy_generate_bid(probes), **values))
+                    db.session.commit()
+                    probe_timings.append(time.perf_counter() - started)
+                # Random BIDs would collide with the next round's seeded ones
+                db.session.execute(text("DELETE FROM booking WHERE client_name = 'Probe'"))
+                db.session.commit()
+                results[f'{fill}%'] = {
+                    'reserve_slot': latency_summary(timings),
+                    'random_probe': {**latency_summary(probe_timings), 'lookups_per_booking': round(probes[0] / args.samples, 2)},
+                }
+    return {'samples': args.samples, 'fills': results}
+
+
+def bench_slots(args):
+    """Fire many concurrent reservations at one slot; exactly one may win."""
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import text
+    from app import db
+    from app.models import Booking
+    from app.reservations import reserve_slot
+
+    slot = dict(hall_id=1, date=datetime.date(2026, 12, 25), time_slot='night')
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.session.execute(text("INSERT INTO user (username, name, password_hash, role) VALUES ('bench', 'Bench', 'x', 'user')"))
+            db.session.execute(text("INSERT INTO hall (name) VALUES ('Hall 1')"))
+            db.session.commit()
+
+        def attempt(i):
+            with app.app_context():
+                started = time.perf_counter()
+                booking_id = reserve_slot(dict(slot, client_name=f'Client {i}', phone='9800000000', address='Synthetic address', user_id=1))
+                return booking_id, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            outcomes = list(pool.map(attempt, range(args.requests)))
+        elapsed = time.perf_counter() - started
+        with app.app_context():
+            stored = Booking.query.filter_by(**slot).count()
+
+    winners = [booking_id for booking_id, _ in outcomes if booking_id is not None]
+    if len(winners) != 1 or stored != 1:
+        raise SystemExit(f'Double booking: {len(winners)} winners, {stored} rows stored')
+    return {'requests': args.requests, 'threads': args.threads, 'winners': len(winners), 'conflicts': args.requests - len(winners),
+            'rows_stored': stored, 'seconds': round(elapsed, 3), **latency_summary([seconds for _, seconds in outcomes])}
+
+
+def logged_in_client(app, role='user'):
+    """Test client signed in as a fresh user."""
+    from app import db
+    from app.models import User
+    with app.app_context():
+        user = User(username=f'bench-{role}', name='Bench', role=role)
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': f'bench-{role}', 'password': 'bench'})
+    return client
+
+
+def bench_batch(args):
+    """Bookings per second through /api/bookings/batch at several batch sizes."""
+    from sqlalchemy import text
+    from app import db
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.session.execute(text("INSERT INTO hall (name) VALUES ('Hall 1'), ('Hall 2')"))
+            db.session.commit()
+        client = logged_in_client(app)
+        # Consecutive free slots: day and night of each date in turn
+        slots = ({'hall_id': 1, 'date': (datetime.date(2026, 1, 1) + datetime.timedelta(days=i // 2)).isoformat(),
+                  'time_slot': ('day', 'night')[i % 2]} for i in range(10 ** 7))
+        for size in sizes:
+            timings = []
+            started = time.perf_counter()
+            for _ in range(args.bookings // size):
+                items = [next(slots) for _ in range(size)]
+                request_started = time.perf_counter()
+                response = client.post('/api/bookings/batch', json={
+                    'client_name': 'Bench', 'phone': '9800000000', 'address': 'Synthetic address', 'items': items})
+                timings.append(time.perf_counter() - request_started)
+                if response.status_code != 200 or response.json['created'] != len(items):
+                    raise SystemExit(f'Batch failed: {response.status_code} {response.get_data(as_text=True)[:200]}')
+            elapsed = time.perf_counter() - started
+            created = args.bookings // size * size
+            results[str(size)] = {'bookings_per_second': round(created / elapsed), **latency_summary(timings)}
+    return {'bookings': args.bookings, 'batch_sizes': results}
+
+
+def bench_receipts(args):
+    """Receipt download latency with the PDF cache cold versus warm."""
+    from sqlalchemy import text
+    from app import db
+    from app.receipts import receipts
+    from app.reservations import reserve_slot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        client = logged_in_client(app)
+        with app.app_context():
+            db.session.execute(text("INSERT INTO hall (name) VALUES ('Hall 1')"))
+            db.session.commit()
+            booking_id = reserve_slot(dict(hall_id=1, date=datetime.date(2026, 12, 25), time_slot='night', client_name='Bench Client',
+                                           phone='9800000000', address='Synthetic address', user_id=1, total=5000.0, advance_paid=1000.0, balance=4000.0))
+        url = f'/print_receipt/{booking_id}'
+
+        def timed_get():
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.status_code != 200:
+                raise SystemExit(f'Receipt failed: {response.status_code}')
+            return time.perf_counter() - started
+
+        first = timed_get()  # includes importing ReportLab
+        cold = []
+        for _ in range(args.samples):
+            receipts.clear()
+            cold.append(timed_get())
+        warm = [timed_get() for _ in range(args.samples)]
+    return {'samples': args.samples, 'first_ms': round(first * 1000, 3), 'cold': latency_summary(cold), 'warm': latency_summary(warm),
+            'cache': receipts.stats()}
+
+
+def bench_batch_receipts(args):
+    """A month of receipts: one download per booking versus one combined PDF or ZIP."""
+    from sqlalchemy import text
+    from app import db
+    from app.receipts import receipts
+    from app.reservations import reserve_slots
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        client = logged_in_client(app)
+        with app.app_context():
+            db.session.execute(text("INSERT INTO hall (name) VALUES ('Hall 1')"))
+            db.session.commit()
+            slots = [(1, datetime.date(2026, 1, 1) + datetime.timedelta(days=i // 2), ('day', 'night')[i % 2]) for i in range(args.bookings)]
+            booked = reserve_slots(dict(client_name='Bench Client', phone='9800000000', address='Synthetic address', user_id=1,
+                                        total=5000.0, advance_paid=1000.0, balance=4000.0), slots)
+            ids = [booking_id for booking_id, _ in booked.values()]
+        client.get(f'/print_receipt/{ids[0]}')  # import ReportLab outside the timings
+
+        def timed(url):
+            receipts.clear()
+            started = time.perf_counter()
+            response = client.get(url)
+            body = response.get_data()
+            if response.status_code != 200:
+                raise SystemExit(f'{url} failed: {response.status_code}')
+            return round((time.perf_counter() - started) * 1000, 1), len(body)
+
+        one_by_one = 0.0
+        receipts.clear()
+        for booking_id in ids:
+            one_by_one += timed(f'/print_receipt/{booking_id}')[0]
+        month = '/receipts?hall=1&from=2026-01-01&to=2027-01-01'
+        pdf_ms, pdf_bytes = timed(month)
+        results = {'bookings': len(ids), 'one_by_one_ms': round(one_by_one, 1),
+                   'combined_pdf': {'ms': pdf_ms, 'bytes': pdf_bytes}}
+        for workers in sorted({1, args.workers}):
+            receipts.configure(receipts.maxsize, workers)
+            timed(month + '&format=zip')  # start the pool
+            zip_ms, zip_bytes = timed(month + '&format=zip')
+            results[f'zip_workers_{workers}'] = {'ms': zip_ms, 'bytes': zip_bytes, 'pool': receipts.stats()['pool']}
+    return results
+
+
+# Modules serverless mode must leave to first use
+DEFERRED_MODULES = ('alembic', 'flask_migrate', 'wtforms', 'flask_wtf', 'reportlab', 'multiprocessing',
+                    'app.forms', 'app.exports', 'app.receipt_pdf')
+
+COLD_START = """
+import sys, time, json
+started = time.perf_counter()
+import run
+print(json.dumps({'ms': (time.perf_counter() - started) * 1000, 'modules': sorted(sys.modules)}))
+"""
+
+
+def cold_start(serverless, db_path):
+    """One fresh interpreter importing run.py: (ms, loaded modules, -X importtime log)."""
+    env = dict(os.environ, SECRET_KEY='benchmark', DATABASE_URL=f'sqlite:///{db_path}', SERVERLESS='1' if serverless else '0')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', COLD_START], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode:
+        raise SystemExit(f'Importing run.py failed:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report['ms'], report['modules'], result.stderr
+
+
+def slowest_imports(log, count=15):
+    """Modules imported by run.py or the app package, by cumulative time in an -X importtime log."""
+    totals = {}
+    for line in log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth in (1, 2):
+            totals[name.strip()] = int(cumulative)
+    return [{'module': name, 'ms': round(us / 1000, 1)} for name, us in sorted(totals.items(), key=lambda item: -item[1])[:count]]
+
+
+def bench_imports(args):
+    """Cold-start import time of the WSGI entry point, checked against a budget."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        for serverless in (False, True):
+            runs = [cold_start(serverless, db_path) for _ in range(args.runs)]
+            times = [ms for ms, _, _ in runs]
+            _, modules, log = min(runs, key=lambda run: run[0])
+            results['serverless' if serverless else 'default'] = {
+                'median_ms': round(statistics.median(times), 1), 'min_ms': round(min(times), 1), 'modules': len(modules),
+                'slowest': slowest_imports(log)}
+            if serverless:
+                eager = [name for name in DEFERRED_MODULES if name in modules]
+                if args.profile:
+                    with open(args.profile, 'w') as f:
+                        f.write(log)
+    median = results['serverless']['median_ms']
+    if eager:
+        raise SystemExit(f'Serverless cold start imports {", ".join(eager)}; these must load on first use')
+    if median > args.budget_ms:
+        raise SystemExit(f'Serverless cold start takes {median} ms, over the {args.budget_ms} ms budget')
+    return {'runs': args.runs, 'budget_ms': args.budget_ms, **results}
+
+
+FIRST_REQUESTS = """
+import sys, time, json
+import run
+client = run.app.test_client()
+timings = {}
+for url in sys.argv[1:]:
+    started = time.perf_counter()
+    status = client.get(url).status_code
+    timings[url] = round((time.perf_counter() - started) * 1000, 1)
+    if status != 200:
+        raise SystemExit(f'{url} returned {status}')
+print(json.dumps(timings))
+"""
+
+
+def bench_warmup(args):
+    """First requests in a fresh serverless process, with and without /api/warmup first."""
+    from sqlalchemy import text
+    from app import db
+
+    urls = ['/', '/hall/1', '/monthly/total/2026/1']
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = make_app(db_path)
+        with app.app_context():
+            db.session.execute(text("INSERT INTO hall (name) VALUES ('AR Garden'), ('Diamond Palace')"))
+            db.session.commit()
+        env = dict(os.environ, SECRET_KEY='benchmark', DATABASE_URL=f'sqlite:///{db_path}', SERVERLESS='1')
+        results = {}
+        for label, sequence in (('cold', urls), ('warmed', ['/api/warmup'] + urls)):
+            runs = []
+            for _ in range(args.runs):
+                result = subprocess.run([sys.executable, '-c', FIRST_REQUESTS, *sequence], env=env, capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__)))
+                if result.returncode:
+                    raise SystemExit(f'First requests failed:\n{result.stderr[-2000:]}')
+                runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+            results[label] = {url: statistics.median(run[url] for run in runs) for url in sequence}
+    return {'runs': args.runs, **results}
+
+
+# bookings, halls, users, years; the six-digit BID space caps a database at 10**6 bookings
+SCALES = {'1k': (1000, 2, 10, 2), '100k': (100000, 20, 100, 7), '1m': (990000, 100, 1000, 14)}
+SEED_START = datetime.date(2025, 1, 1)
+SEED_CHUNK = 5000
+
+# Indexes the migrations add on top of the models (create_all cannot reproduce
+# them, and the migration chain cannot start from an empty database)
+MIGRATED_INDEXES = [('ix_booking_user_id', 'booking', 'user_id'), ('ix_booking_status', 'booking', 'status'),
+                    ('ix_booking_phone', 'booking', 'phone'), ('ix_booking_hall_id', 'booking', 'hall_id'),
+                    ('ix_booking_date', 'booking', 'date'), ('ix_booking_client_name', 'booking', 'client_name'),
+                    ('ix_user_username', '"user"', 'username')]
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE booking_fts USING fts5(bid, client_name, phone_digits, content='booking', content_rowid='id')",
+    """CREATE TRIGGER booking_fts_ai AFTER INSERT ON booking BEGIN
+        INSERT INTO booking_fts(rowid, bid, client_name, phone_digits) VALUES (new.id, new.bid, new.client_name, new.phone_digits);
+    END""",
+    """CREATE TRIGGER booking_fts_ad AFTER DELETE ON booking BEGIN
+        INSERT INTO booking_fts(booking_fts, rowid, bid, client_name, phone_digits) VALUES ('delete', old.id, old.bid, old.client_name, old.phone_digits);
+    END""",
+    """CREATE TRIGGER booking_fts_au AFTER UPDATE ON booking BEGIN
+        INSERT INTO booking_fts(booking_fts, rowid, bid, client_name, phone_digits) VALUES ('delete', old.id, old.bid, old.client_name, old.phone_digits);
+        INSERT INTO booking_fts(rowid, bid, client_name, phone_digits) VALUES (new.id, new.bid, new.client_name, new.phone_digits);
+    END""",
+    "INSERT INTO booking_fts(booking_fts) VALUES ('rebuild')",
+]
+POSTGRES_SEARCH_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX ix_booking_client_name_trgm ON booking USING gin (lower(client_name) gin_trgm_ops)',
+    'CREATE INDEX ix_booking_phone_digits_trgm ON booking USING gin (phone_digits gin_trgm_ops)',
+    'CREATE INDEX ix_booking_bid_prefix ON booking (bid text_pattern_ops)',
+]
+
+
+def seed_database(app, bookings, halls, users, years, rng):
+    """Fill the schema with ``bookings`` on distinct random slots across ``halls`` and ``years``."""
+    from sqlalchemy import insert, text, update
+    from app import db
+    from app.bids import SEQUENCE_NAME, scramble
+    from app.models import BidSequence, Booking, Hall, User, normalize_phone
+    from app.rollups import rebuild as rebuild_rollups
+    from werkzeug.security import generate_password_hash
+
+    days = (SEED_START.replace(year=SEED_START.year + years) - SEED_START).days
+    capacity = halls * days * 2
+    if bookings > capacity:
+        raise SystemExit(f'{bookings} bookings do not fit in {halls} halls over {years} years ({capacity} slots)')
+    with app.app_context():
+        if db.session.query(Booking.id).first() is not None:
+            raise SystemExit('Refusing to seed a database that already has bookings')
+        names = ['AR Garden', 'Diamond Palace'] + [f'Hall {i}' for i in range(3, halls + 1)]
+        db.session.execute(insert(Hall.__table__), [{'id': i, 'name': name} for i, name in enumerate(names, 1)])
+        password_hash = generate_password_hash('bench')  # hashing is slow; every user shares one
+        db.session.execute(insert(User.__table__), [{'id': i, 'username': f'user{i}', 'name': f'User {i}', 'password_hash': password_hash,
+                                                     'role': 'admin' if i == 1 else 'user'} for i in range(1, users + 1)])
+        slots = rng.sample(range(capacity), bookings)
+        for start in range(0, bookings, SEED_CHUNK):
+            rows = []
+            for counter in range(start, min(start + SEED_CHUNK, bookings)):
+                slot_index, hall_index = divmod(slots[counter], halls)
+                day, slot = divmod(slot_index, 2)
+                date = SEED_START + datetime.timedelta(days=day)
+                created_at = datetime.datetime.combine(date, datetime.time(10)) - datetime.timedelta(days=rng.randint(1, 180))
+                status = rng.choice(('pending', 'confirmed'))
+                phone = f'98{rng.randrange(10 ** 8):08d}'
+                total = float(rng.randrange(20, 200) * 500)
+                advance = float(rng.randrange(0, int(total) + 1, 500))
+                rows.append({'bid': f'{scramble(counter):06d}', 'hall_id': hall_index + 1, 'date': date, 'time_slot': ('day', 'night')[slot],
+                             'client_name': f'Client {counter}', 'phone': phone, 'phone_digits': normalize_phone(phone),
+                             'address': f'{rng.randint(1, 999)} Synthetic Street', 'status': status, 'user_id': rng.randint(1, users),
+                             'created_at': created_at, 'confirmed_at': created_at + datetime.timedelta(days=1) if status == 'confirmed' else None,
+                             'total': total, 'advance_paid': advance, 'balance': total - advance})
+            db.session.execute(insert(Booking.__table__), rows)
+        db.session.execute(update(BidSequence.__table__).where(BidSequence.name == SEQUENCE_NAME).values(next_value=bookings))
+        rebuild_rollups(db.session.connection())  # Core inserts bypass the ORM hooks that maintain it
+        for name, table, column in MIGRATED_INDEXES:
+            db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})'))
+        dialect = db.engine.dialect.name
+        for statement in SQLITE_SEARCH_DDL if dialect == 'sqlite' else POSTGRES_SEARCH_DDL if dialect == 'postgresql' else []:
+            db.session.execute(text(statement))
+        db.session.commit()
+        if dialect == 'postgresql':
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+        return dialect
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def queries_in(response):
+    """Statement count from the Server-Timing header app.instrumentation adds."""
+    timing = response.headers.get('Server-Timing', '')
+    marker = 'desc="'
+    if marker not in timing:
+        return None
+    return int(timing.split(marker, 1)[1].split(' ', 1)[0])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(args):
+    """Key routes through the test client against a seeded database."""
+    import io
+    import zipfile
+    from app.availability import availability
+    from app.calendar_cache import month_grids
+    from app.receipts import receipts
+
+    bookings, halls, users, years = SCALES[args.scale]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'), args.database)
+        started = time.perf_counter()
+        dialect = seed_database(app, bookings, halls, users, years, rng)
+        seed_seconds = time.perf_counter() - started
+        rss_after_seed = peak_rss_mb()
+        client = logged_in_client(app, 'admin')
+        last_year = SEED_START.year + years - 1
+        free_days = (SEED_START.replace(year=last_year + 1) + datetime.timedelta(days=i) for i in range(10 ** 6))
+        backup = {}
+
+        def random_month():
+            return rng.randint(SEED_START.year, last_year), rng.randint(1, 12)
+
+        def index():
+            year, month = random_month()
+            return client.get(f'/?year={year}&month={month}')
+
+        def hall():
+            year, month = random_month()
+            return client.get(f'/hall/{rng.randint(1, halls)}?year={year}&month={month}')
+
+        def search():
+            return client.get(f'/search?q=Client+{rng.randrange(bookings)}')
+
+        def search_bid():
+            from app.bids import scramble
+            return client.get(f'/search?q={scramble(rng.randrange(bookings)):06d}')
+
+        def export_csv():
+            year = rng.randint(SEED_START.year, last_year)
+            return client.get(f'/export_csv?hall={rng.randint(1, halls)}&from={year}-01-01&to={year}-12-31')
+
+        def print_receipt():
+            return client.get(f'/print_receipt/{rng.randint(1, bookings)}')
+
+        def book():
+            day = next(free_days)
+            return client.post(f'/book/1/{day.year}/{day.month}/{day.day}', data={
+                'client_name': 'Bench Client', 'phone': '9800000000', 'address': 'Synthetic address', 'time_slot': 'day',
+                'advance_paid': 0, 'balance': 0, 'total': 0})
+
+        def finance():
+            return client.get(f'/admin/finance?year={rng.randint(SEED_START.year, last_year)}')
+
+        def admin_backup():
+            response = client.post('/admin/backup', data={})
+            with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+                for name in archive.namelist():
+                    backup['schema' if name.endswith('.sql') else 'data'] = archive.read(name)
+            return response
+
+        def admin_restore():
+            return client.post('/admin/restore', content_type='multipart/form-data', data={
+                'schema_file': (io.BytesIO(backup['schema']), 'schema.sql'),
+                'data_file': (io.BytesIO(backup['data']), 'data.ndjson.gz')})
+
+        heavy = args.heavy_samples
+        routes = [('index', index, args.samples), ('hall', hall, args.samples), ('search', search, args.samples),
+                  ('search_bid', search_bid, args.samples), ('export_csv', export_csv, heavy), ('print_receipt', print_receipt, args.samples),
+                  ('book', book, args.samples), ('finance', finance, args.samples), ('admin_backup', admin_backup, heavy), ('admin_restore', admin_restore, heavy)]
+        results = {}
+        for name, request, samples in routes:
+            if not samples:
+                continue
+            timings, queries = [], []
+            for _ in range(samples):
+                if args.cold:
+                    month_grids.clear()
+                    availability.clear()
+                    receipts.clear()
+                request_started = time.perf_counter()
+                response = request()
+                response.get_data()  # drain streamed bodies inside the timing
+                timings.append(time.perf_counter() - request_started)
+                if response.status_code >= 400 or (name == 'admin_restore' and 'failed' in str(response.headers.get('Location'))):
+                    raise SystemExit(f'{name} failed: {response.status_code}')
+                queries.append(queries_in(response))
+            counted = [count for count in queries if count is not None]
+            results[name] = {'samples': samples, **latency_summary(timings),
+                             'queries_per_request': round(float(statistics.mean(counted)), 1) if counted else None,
+                             'max_queries': max(counted) if counted else None, 'peak_rss_mb': peak_rss_mb()}
+    report = {'commit': git_commit(), 'recorded_at': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'database': dialect, 'scale': args.scale,
+              'data': {'bookings': bookings, 'halls': halls, 'users': users, 'years': years, 'seed': args.seed},
+              'cache': 'cold' if args.cold else 'warm', 'seed_seconds': round(seed_seconds, 1), 'rss_after_seed_mb': rss_after_seed,
+              'routes': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': 'suite', **report}, f, indent=2)
+    return report
+
+
+def bench_finance(args):
+    """Finance report figures from booking_rollup versus a live SUM over booking."""
+    from sqlalchemy import extract
+    from app import db
+    from app.models import Booking, Hall
+    from app.rollups import aggregate, finance_report, reconcile
+
+    bookings, halls, users, years = SCALES[args.scale]
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'), args.database)
+        seed_database(app, bookings, halls, users, years, random.Random(args.seed))
+        with app.app_context():
+            hall_rows = Hall.query.order_by(Hall.id).all()
+            year = SEED_START.year + years - 1
+            live_query = aggregate().where(extract('year', Booking.date).in_((year, year - 1)))
+            rollup, live = [], []
+            for _ in range(args.samples):
+                started = time.perf_counter()
+                finance_report(hall_rows, year)
+                rollup.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                db.session.execute(live_query).all()
+                live.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            mismatches = reconcile(db.session.connection())
+            reconcile_seconds = time.perf_counter() - started
+    return {'scale': args.scale, 'bookings': bookings, 'samples': args.samples,
+            'rollup': latency_summary(rollup), 'live_sum': latency_summary(live),
+            'reconcile_s': round(reconcile_seconds, 2), 'mismatches': len(mismatches)}
+
+
+# Most statements a 304 may run: the data version lookup
+REVALIDATION_QUERIES = 1
+
+
+def bench_revalidate(args):
+    """Full renders versus conditional GETs of the public pages; fails if a
+    revalidation hit is not a 304 or runs more than REVALIDATION_QUERIES."""
+    bookings, halls, users, years = SCALES[args.scale]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'), args.database)
+        seed_database(app, bookings, halls, users, years, rng)
+        client = app.test_client()
+        year, month = SEED_START.year + years - 1, rng.randint(1, 12)
+        pages = {'index': f'/?year={year}&month={month}', 'hall': f'/hall/1?year={year}&month={month}',
+                 'date': f'/date/{year}/{month}/15', 'monthly_total': f'/monthly/total/{year}/{month}',
+                 'monthly_hall': f'/monthly/hall/1/{year}/{month}'}
+        results = {}
+        for name, url in pages.items():
+            full, revalidated, queries = [], [], []
+            etag = None
+            for _ in range(args.samples):
+                started = time.perf_counter()
+                response = client.get(url)
+                response.get_data()
+                full.append(time.perf_counter() - started)
+                etag = response.headers.get('ETag')
+                if response.status_code != 200 or not etag:
+                    raise SystemExit(f'{url} returned {response.status_code} without an ETag')
+            for _ in range(args.samples):
+                started = time.perf_counter()
+                response = client.get(url, headers={'If-None-Match': etag})
+                revalidated.append(time.perf_counter() - started)
+                queries.append(queries_in(response))
+                if response.status_code != 304:
+                    raise SystemExit(f'{url} revalidation returned {response.status_code}')
+            if max(queries) > REVALIDATION_QUERIES:
+                raise SystemExit(f'{url} revalidation ran {max(queries)} queries, over {REVALIDATION_QUERIES}')
+            results[name] = {'url': url, 'full': latency_summary(full), 'not_modified': latency_summary(revalidated),
+                             'queries_per_304': max(queries)}
+    return {'scale': args.scale, 'samples': args.samples, 'pages': results}
+
+
+def bench_fragments(args):
+    """Month pages rendered in full versus from cached calendar and table fragments."""
+    from app.fragments import fragments
+
+    bookings, halls, users, years = SCALES[args.scale]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'), args.database)
+        seed_database(app, bookings, halls, users, years, rng)
+        client = app.test_client()
+        year, month = SEED_START.year + years - 1, rng.randint(1, 12)
+        pages = {'index': f'/?year={year}&month={month}', 'hall': f'/hall/1?year={year}&month={month}',
+                 'monthly_total': f'/monthly/total/{year}/{month}', 'monthly_hall': f'/monthly/hall/1/{year}/{month}'}
+        results = {}
+        for name, url in pages.items():
+            timings = {}
+            for mode, max_bytes in (('uncached', 0), ('cached', app.config['FRAGMENT_CACHE_BYTES'])):
+                fragments.configure(max_bytes)
+                client.get(url).get_data()  # fills the fragment cache and the per-process caches alike
+                samples = []
+                for _ in range(args.samples):
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    response.get_data()
+                    samples.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise SystemExit(f'{url} returned {response.status_code}')
+                timings[mode] = latency_summary(samples)
+            saved = timings['uncached']['p50_ms'] - timings['cached']['p50_ms']
+            results[name] = {'url': url, **timings, 'saved_p50_ms': round(saved, 3),
+                             'saved_pct': round(saved * 100 / timings['uncached']['p50_ms'], 1)}
+    return {'scale': args.scale, 'samples': args.samples, 'pages': results}
+
+
+def bench_dashboard(args):
+    """Dashboard latency and query count as the number of halls grows; fails
+    if the query count changes with it."""
+    from app.availability import availability
+    from app.calendar_cache import month_grids
+    from app.fragments import fragments
+
+    results = {}
+    for hall_count in (int(n) for n in args.halls.split(',')):
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, 'bench.db'))
+            seed_database(app, hall_count * args.bookings_per_hall, hall_count, 5, 2, rng)
+            client = app.test_client()
+            pages = -(-hall_count // 10)
+            urls = {'first_page': '/', 'last_page': f'/?page={pages}'}
+            results[hall_count] = {}
+            for name, url in urls.items():
+                timings, queries = [], []
+                for _ in range(args.samples):
+                    month_grids.clear()
+                    availability.clear()
+                    fragments.clear()
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    response.get_data()
+                    timings.append(time.perf_counter() - started)
+                    queries.append(queries_in(response))
+                    if response.status_code != 200:
+                        raise SystemExit(f'{url} returned {response.status_code} with {hall_count} halls')
+                results[hall_count][name] = {**latency_summary(timings), 'queries': max(queries)}
+    counts = {entry['queries'] for pages in results.values() for entry in pages.values()}
+    if len(counts) > 1:
+        raise SystemExit(f'Dashboard query count varies with the number of halls: {sorted(counts)}')
+    return {'bookings_per_hall': args.bookings_per_hall, 'samples': args.samples, 'halls': results}
+
+
+def bench_identity(args):
+    """Signed-in requests with the session identity cache against a user
+    lookup on every request (IDENTITY_CACHE_TTL=0); fails unless the cache
+    saves that query."""
+    from app.identity import identities
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        client = logged_in_client(app, 'admin')
+        for name, ttl in (('session_cached', 60), ('lookup_every_request', 0)):
+            identities.configure(ttl)
+            client.get('/admin/cache_stats')
+            timings, queries = [], []
+            for _ in range(args.samples):
+                started = time.perf_counter()
+                response = client.get('/admin/cache_stats')
+                timings.append(time.perf_counter() - started)
+                queries.append(queries_in(response))
+                if response.status_code != 200:
+                    raise SystemExit(f'/admin/cache_stats returned {response.status_code}')
+            results[name] = {**latency_summary(timings), 'queries': max(queries)}
+    if results['session_cached']['queries'] >= results['lookup_every_request']['queries']:
+        raise SystemExit('The session identity cache did not save the user lookup')
+    return {'samples': args.samples, 'url': '/admin/cache_stats', 'modes': results}
+
+
+# Most rows the dashboard or hall calendar may read; a whole-table load reads thousands
+PAGE_ROWS = 500
+# SQLite plan step that reads every booking (not a SEARCH through an index)
+FULL_SCAN = re.compile(r'SCAN (TABLE )?booking\b')
+
+
+def bench_scans(args):
+    """Queries run and rows read by the dashboard and hall calendar with cold
+    caches; fails if a page reads more than PAGE_ROWS rows or, on SQLite,
+    plans a full scan of the booking table."""
+    from sqlalchemy import event
+    from app import db
+    from app.availability import availability
+    from app.calendar_cache import month_grids
+    from app.fragments import fragments
+
+    bookings, halls, users, years = SCALES[args.scale]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'), args.database)
+        dialect = seed_database(app, bookings, halls, users, years, rng)
+        client = app.test_client()
+        year, month = SEED_START.year + years - 1, rng.randint(1, 12)
+        pages = {'index': f'/?year={year}&month={month}', 'hall': f'/hall/{rng.randint(1, halls)}?year={year}&month={month}'}
+        read, statements = [0], []
+
+        def count_rows(state):
+            frozen = state.invoke_statement().freeze()
+            read[0] += len(frozen().all())
+            return frozen()
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        results = {}
+        with app.app_context():
+            event.listen(db.session, 'do_orm_execute', count_rows)
+            event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for name, url in pages.items():
+                timings, queries, rows = [], [], []
+                for _ in range(args.samples):
+                    month_grids.clear()
+                    availability.clear()
+                    fragments.clear()
+                    read[0] = 0
+                    statements.clear()
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise SystemExit(f'{url} returned {response.status_code}')
+                    queries.append(queries_in(response))
+                    rows.append(read[0])
+                if max(rows) > PAGE_ROWS:
+                    raise SystemExit(f'{url} read {max(rows)} rows, over {PAGE_ROWS}')
+                if dialect == 'sqlite':
+                    with app.app_context():
+                        for statement, parameters in list(statements):
+                            plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+                            if any(FULL_SCAN.match(row[-1]) for row in plan):
+                                raise SystemExit(f'{url} scans the whole booking table: {statement}')
+                results[name] = {'url': url, **latency_summary(timings), 'queries': max(queries), 'rows': max(rows)}
+        finally:
+            with app.app_context():
+                event.remove(db.session, 'do_orm_execute', count_rows)
+                event.remove(db.engine, 'before_cursor_execute', record)
+    return {'scale': args.scale, 'samples': args.samples, 'max_rows': PAGE_ROWS, 'pages': results}
+
+
+def bench_ranges(args):
+    """The booking list and the CSV export for the same from/to query string;
+    fails unless both return exactly the bookings dated from..to inclusive."""
+    import csv
+    import io
+    from app import db
+    from app.models import Booking
+
+    bookings, halls, users, years = SCALES['1k']
+    rng = random.Random(args.seed)
+    listed_bid = re.compile(r'<td class="px-6 py-4 text-gray-800">(\w{6})</td>')
+    checked = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        seed_database(app, bookings, halls, users, years, rng)
+        client = logged_in_client(app, 'admin')
+        for _ in range(args.samples):
+            start = SEED_START + datetime.timedelta(days=rng.randrange(365 * years - 7))
+            end = start + datetime.timedelta(days=rng.randrange(7))
+            hall_id = rng.randint(1, halls)
+            query = urllib.parse.urlencode({'hall': hall_id, 'from': start.isoformat(), 'to': end.isoformat()})
+            with app.app_context():
+                expected = set(db.session.scalars(db.select(Booking.bid).where(
+                    Booking.hall_id == hall_id, Booking.date >= start, Booking.date <= end)))
+            listed = set(listed_bid.findall(client.get(f'/bookings?{query}').get_data(as_text=True)))
+            exported = {row[0] for row in list(csv.reader(io.StringIO(client.get(f'/export_csv?{query}').get_data(as_text=True))))[1:]}
+            if listed != expected or exported != expected:
+                raise SystemExit(f'{query}: expected {len(expected)} bookings, listed {len(listed)}, exported {len(exported)}')
+            checked += len(expected)
+    return {'ranges': args.samples, 'bookings_checked': checked}
+
+
+SEED_EXPORT = """
+import sys, random
+import benchmark
+benchmark.seed_database(benchmark.make_app(sys.argv[1]), *map(int, sys.argv[2:6]), random.Random(int(sys.argv[6])))
+"""
+
+EXPORT_MEMORY = """
+import sys, json
+import benchmark
+app = benchmark.make_app(sys.argv[1])
+client = benchmark.logged_in_client(app, 'admin')
+query = '&gzip=1' if sys.argv[2] == '1' else ''
+client.get(f'/export_csv?from=2000-01-01&to=2000-01-01{query}').get_data()  # first-use imports before the baseline
+baseline = benchmark.peak_rss_mb()
+response = client.get(f'/export_csv?{query}', buffered=False)
+size = chunks = 0
+for chunk in response.response:
+    size += len(chunk)
+    chunks += 1
+response.close()
+print(json.dumps({'status': response.status_code, 'bytes': size, 'chunks': chunks, 'baseline_mb': baseline, 'peak_mb': benchmark.peak_rss_mb()}))
+"""
+
+
+def bench_export_memory(args):
+    """Peak RSS of a full streamed CSV export, each count seeded and exported
+    in fresh processes; fails if the peak grows with the row count."""
+    years = SCALES['1m'][3]
+    days = (SEED_START.replace(year=SEED_START.year + years) - SEED_START).days
+    results = {}
+    for count in (int(n) for n in args.counts.split(',')):
+        halls = max(2, -(-count // (days * 2)) + 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            # Seeding runs in its own process too: ru_maxrss survives fork and
+            # exec, so a child would inherit this process's seeding peak
+            env = dict(os.environ, SECRET_KEY='benchmark')
+            cwd = os.path.dirname(os.path.abspath(__file__))
+            seed = subprocess.run([sys.executable, '-c', SEED_EXPORT, db_path, *map(str, (count, halls, 10, years, args.seed))], env=env,
+                                  capture_output=True, text=True, cwd=cwd)
+            if seed.returncode:
+                raise SystemExit(f'Seeding {count} bookings failed:\n{seed.stderr[-2000:]}')
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', EXPORT_MEMORY, db_path, '1' if args.gzip else '0'], env=env, capture_output=True,
+                                    text=True, cwd=cwd)
+        if result.returncode:
+            raise SystemExit(f'Exporting {count} bookings failed:\n{result.stderr[-2000:]}')
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        if run['status'] != 200:
+            raise SystemExit(f'Exporting {count} bookings returned {run["status"]}')
+        results[count] = {'halls': halls, 'seconds': round(time.perf_counter() - started, 1), 'bytes': run['bytes'], 'chunks': run['chunks'],
+                          'baseline_mb': run['baseline_mb'], 'peak_mb': run['peak_mb'],
+                          'growth_mb': round(run['peak_mb'] - run['baseline_mb'], 1) if run['peak_mb'] is not None else None}
+    peaks = [entry['peak_mb'] for entry in results.values() if entry['peak_mb'] is not None]
+    if peaks and max(peaks) - peaks[0] > args.slack_mb:
+        raise SystemExit(f'Export peak RSS grows with the row count: {json.dumps(results)}')
+    return {'gzip': args.gzip, 'slack_mb': args.slack_mb, 'counts': results}
+
+
+def bench_compare(args):
+    """p50/p95 and query counts of two saved suite runs, new relative to base."""
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    routes = {}
+    for name, after in new['routes'].items():
+        before = base['routes'].get(name)
+        if before is None:
+            continue
+        routes[name] = {metric: {'base': before[metric], 'new': after[metric],
+                                 'ratio': round(after[metric] / before[metric], 2) if before[metric] else None}
+                        for metric in ('p50_ms', 'p95_ms', 'queries_per_request') if before.get(metric) is not None and after.get(metric) is not None}
+    return {'base': {key: base.get(key) for key in ('commit', 'scale', 'database', 'cache')},
+            'new': {key: new.get(key) for key in ('commit', 'scale', 'database', 'cache')}, 'routes': routes}
+
+
+CSRF_FIELD = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class StaffSession:
+    """One staff member's browser: a cookie, a CSRF token and plain HTTP requests."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, form=None):
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status, response.getheader('Location') or '', data
+
+    def form_token(self, path):
+        status, _, data = self.request('GET', path)
+        match = CSRF_FIELD.search(data.decode('utf-8', 'replace'))
+        if status != 200 or match is None:
+            raise RuntimeError(f'GET {path} returned {status} without a CSRF token')
+        return match.group(1)
+
+    def login(self, username, password):
+        token = self.form_token('/auth/login')
+        status, location, _ = self.request('POST', '/auth/login', {'csrf_token': token, 'username': username, 'password': password})
+        if status != 302 or '/auth/login' in location:
+            raise SystemExit(f'Login as {username} failed: {status}')
+
+
+def timed_pool(pool, waits, lock):
+    """Record how long each connection checkout from ``pool`` takes."""
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            with lock:
+                waits.append(time.perf_counter() - started)
+    pool.connect = timed_connect
+
+
+def load_summary(seconds):
+    if not seconds:
+        return {'count': 0}
+    return {'count': len(seconds), **latency_summary(seconds), 'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+            'max_ms': round(max(seconds) * 1000, 3)}
+
+
+def run_load(args, pool_size, tmp):
+    """Serve a fresh app on a local port and drive it with ``args.sessions`` staff sessions."""
+    import logging
+    from werkzeug.serving import make_server
+    from app import db
+    from app.availability import availability
+    from app.bids import allocator
+    from app.calendar_cache import month_grids
+
+    os.environ['DB_POOL_SIZE'] = str(pool_size)
+    os.environ['DB_MAX_OVERFLOW'] = str(args.max_overflow)
+    os.environ['DB_POOL_TIMEOUT'] = str(args.pool_timeout)
+    app = make_app(os.path.join(tmp, f'load_{pool_size}.db'), args.database)
+    app.config['WTF_CSRF_ENABLED'] = True  # log in and submit forms like a browser
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.logger.setLevel(logging.ERROR)
+    month_grids.clear()
+    availability.clear()
+    allocator.reset()
+    rng = random.Random(args.seed)
+    seed_database(app, args.seed_bookings, 2, args.sessions, 1, rng)
+
+    lock = threading.Lock()
+    waits = []
+    with app.app_context():
+        timed_pool(db.engine.pool, waits, lock)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Contended slots: both halls, both slots, over a short run of days after the seeded year
+    first_day = SEED_START.replace(year=SEED_START.year + 1)
+    weights = dict(part.split('=') for part in args.mix.split(','))
+    operations, op_weights = list(weights), [float(weight) for weight in weights.values()]
+    booking_ids = list(range(1, args.seed_bookings + 1))
+    latencies = {name: [] for name in operations}
+    outcomes = {'created': 0, 'conflict': 0, 'errors': 0}
+
+    def staff(number):
+        worker_rng = random.Random(args.seed + number)
+        session = StaffSession(server.server_port)
+        session.login(f'user{number}', 'bench')
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            operation = worker_rng.choices(operations, op_weights)[0]
+            if operation == 'book':
+                day = first_day + datetime.timedelta(days=worker_rng.randrange(args.days))
+                hall_id, slot = worker_rng.randint(1, 2), worker_rng.choice(('day', 'night'))
+                path = f'/book/{hall_id}/{day.year}/{day.month}/{day.day}'
+                form = {'csrf_token': session.form_token(f'{path}?slot={slot}'), 'client_name': f'Load {number}',
+                        'phone': '9800000000', 'address': 'Synthetic address', 'time_slot': slot,
+                        'advance_paid': '0', 'balance': '0', 'total': '0'}
+            else:
+                with lock:
+                    booking_id = worker_rng.choice(booking_ids)
+                if operation == 'confirm':
+                    path, form = f'/confirm_booking/{booking_id}', {}
+                else:
+                    path = f'/edit_booking/{booking_id}'
+                    form = {'csrf_token': session.form_token(path), 'client_name': f'Edited by {number}', 'phone': '9800000001',
+                            'address': 'Edited address', 'time_slot': 'day', 'advance_paid': '0', 'balance': '0', 'total': '0'}
+            started = time.perf_counter()
+            status, location, _ = session.request('POST', path, form)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[operation].append(elapsed)
+                if status != 302:
+                    outcomes['errors'] += 1
+                elif operation == 'book':
+                    if '/booking/' in location:
+                        outcomes['created'] += 1
+                        booking_ids.append(int(location.rsplit('/', 1)[1]))
+                    else:
+                        outcomes['conflict'] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.sessions) as executor:
+        for future in [executor.submit(staff, number) for number in range(1, args.sessions + 1)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    with app.app_context():
+        db.engine.dispose()
+
+    attempts = outcomes['created'] + outcomes['conflict']
+    total = sum(len(seconds) for seconds in latencies.values())
+    return {'pool_size': pool_size, 'max_overflow': args.max_overflow, 'requests': total,
+            'throughput_per_second': round(total / elapsed, 1), **outcomes,
+            'conflict_rate': round(outcomes['conflict'] / attempts, 3) if attempts else None,
+            'operations': {name: load_summary(seconds) for name, seconds in latencies.items()},
+            'pool_wait': {**load_summary(waits), 'over_10ms': sum(wait > 0.01 for wait in waits)}}
+
+
+def bench_load(args):
+    """Concurrent staff sessions booking, confirming and editing over real HTTP."""
+    sizes = [int(size) for size in args.pool_sizes.split(',')]
+    if args.database and len(sizes) > 1:
+        raise SystemExit('--database takes one pool size; each run needs an empty database')
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [run_load(args, size, tmp) for size in sizes]
+    return {'sessions': args.sessions, 'duration_s': args.duration, 'days': args.days, 'mix': args.mix,
+            'pool_timeout_s': args.pool_timeout, 'runs': runs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='scenario', required=True)
+    restore = sub.add_parser('restore', help='restore a synthetic backup and report rows per second')
+    restore.add_argument('--bookings', type=int, default=100000)
+    restore.set_defaults(run=bench_restore)
+    bids = sub.add_parser('bids', help='booking creation latency as the BID space fills')
+    bids.add_argument('--fills', default='10,50,90', help='comma-separated percentages of the six-digit space to pre-fill')
+    bids.add_argument('--samples', type=int, default=200)
+    bids.set_defaults(run=bench_bids)
+    slots = sub.add_parser('slots', help='concurrent reservations of a single slot (double-booking stress test)')
+    slots.add_argument('--requests', type=int, default=400)
+    slots.add_argument('--threads', type=int, default=32)
+    slots.set_defaults(run=bench_slots)
+    batch = sub.add_parser('batch', help='bulk booking API throughput by batch size')
+    batch.add_argument('--sizes', default='1,10,50,100', help='comma-separated batch sizes')
+    batch.add_argument('--bookings', type=int, default=1000, help='bookings created per batch size')
+    batch.set_defaults(run=bench_batch)
+    receipts = sub.add_parser('receipts', help='receipt PDF latency, cache cold versus warm')
+    receipts.add_argument('--samples', type=int, default=200)
+    receipts.set_defaults(run=bench_receipts)
+    batch_receipts = sub.add_parser('batch-receipts', help='batch receipt downloads: combined PDF and ZIP versus one at a time')
+    batch_receipts.add_argument('--bookings', type=int, default=60)
+    batch_receipts.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 4), help='render processes for the ZIP download')
+    batch_receipts.set_defaults(run=bench_batch_receipts)
+    imports = sub.add_parser('imports', help='cold-start import time of run.py; fails past the budget or on eager heavy imports')
+    imports.add_argument('--runs', type=int, default=5)
+    imports.add_argument('--budget-ms', type=float, default=1000, help='maximum median serverless import time')
+    imports.add_argument('--profile', help='write the serverless -X importtime log to this file')
+    imports.set_defaults(run=bench_imports)
+    warm = sub.add_parser('warmup', help='first requests after a cold start, with and without /api/warmup')
+    warm.add_argument('--runs', type=int, default=3)
+    warm.set_defaults(run=bench_warmup)
+    suite = sub.add_parser('suite', help='key routes against a seeded database: p50/p95, queries per request, peak RSS')
+    suite.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    suite.add_argument('--database', help='empty database URL to seed instead of a temporary SQLite file')
+    suite.add_argument('--samples', type=int, default=50, help='requests per light route')
+    suite.add_argument('--heavy-samples', type=int, default=3, help='requests for export, backup and restore')
+    suite.add_argument('--cold', action='store_true', help='clear the per-process caches before every request')
+    suite.add_argument('--seed', type=int, default=42, help='random seed for the synthetic data and request mix')
+    suite.add_argument('--output', help='also save the report to this JSON file')
+    suite.set_defaults(run=bench_suite)
+    finance = sub.add_parser('finance', help='finance report from booking_rollup versus a live SUM over all bookings')
+    finance.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    finance.add_argument('--database', help='empty database URL to seed instead of a temporary SQLite file')
+    finance.add_argument('--samples', type=int, default=20)
+    finance.add_argument('--seed', type=int, default=42)
+    finance.set_defaults(run=bench_finance)
+    revalidate = sub.add_parser('revalidate', help='public pages rendered versus revalidated with If-None-Match (304 query count check)')
+    revalidate.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    revalidate.add_argument('--database', help='empty database URL to seed instead of a temporary SQLite file')
+    revalidate.add_argument('--samples', type=int, default=50)
+    revalidate.add_argument('--seed', type=int, default=42)
+    revalidate.set_defaults(run=bench_revalidate)
+    fragment_pages = sub.add_parser('fragments', help='month pages with and without the rendered-fragment cache')
+    fragment_pages.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    fragment_pages.add_argument('--database', help='empty database URL to seed instead of a temporary SQLite file')
+    fragment_pages.add_argument('--samples', type=int, default=50)
+    fragment_pages.add_argument('--seed', type=int, default=42)
+    fragment_pages.set_defaults(run=bench_fragments)
+    dashboard = sub.add_parser('dashboard', help='dashboard latency and query count from 2 to 200 halls (cold caches)')
+    dashboard.add_argument('--halls', default='2,20,200', help='comma-separated hall counts')
+    dashboard.add_argument('--bookings-per-hall', type=int, default=500)
+    dashboard.add_argument('--samples', type=int, default=30)
+    dashboard.add_argument('--seed', type=int, default=42)
+    dashboard.set_defaults(run=bench_dashboard)
+    identity = sub.add_parser('identity', help='signed-in requests with and without the session identity cache')
+    identity.add_argument('--samples', type=int, default=200)
+    identity.set_defaults(run=bench_identity)
+    scans = sub.add_parser('scans', help='queries and rows read by the dashboard and hall calendar (full-table load check)')
+    scans.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    scans.add_argument('--database', help='empty database URL to seed instead of a temporary SQLite file')
+    scans.add_argument('--samples', type=int, default=10)
+    scans.add_argument('--seed', type=int, default=42)
+    scans.set_defaults(run=bench_scans)
+    ranges = sub.add_parser('ranges', help='booking list and CSV export agree on inclusive from/to dates')
+    ranges.add_argument('--samples', type=int, default=50)
+    ranges.add_argument('--seed', type=int, default=42)
+    ranges.set_defaults(run=bench_ranges)
+    export_memory = sub.add_parser('export-memory', help='peak RSS of a full CSV export from 10k to 1m bookings; fails if it grows with rows')
+    export_memory.add_argument('--counts', default='10000,100000,990000', help='comma-separated booking counts')
+    export_memory.add_argument('--gzip', action='store_true', help='export with gzip=1')
+    export_memory.add_argument('--slack-mb', type=float, default=16, help='allowed peak RSS above the smallest count')
+    export_memory.add_argument('--seed', type=int, default=42)
+    export_memory.set_defaults(run=bench_export_memory)
+    compare = sub.add_parser('compare', help='compare two saved suite reports')
+    compare.add_argument('base')
+    compare.add_argument('new')
+    compare.set_defaults(run=bench_compare)
+    load = sub.add_parser('load', help='concurrent staff sessions on the booking write path over HTTP, per pool size')
+    load.add_argument('--sessions', type=int, default=16, help='simultaneous logged-in staff members')
+    load.add_argument('--duration', type=float, default=20, help='seconds each session keeps working')
+    load.add_argument('--pool-sizes', default='2', help='comma-separated pool_size values to compare')
+    load.add_argument('--max-overflow', type=int, default=0)
+    load.add_argument('--pool-timeout', type=int, default=30)
+    load.add_argument('--days', type=int, default=30, help='days of contended slots (fewer days, more conflicts)')
+    load.add_argument('--mix', default='book=6,confirm=2,edit=2', help='relative weights of the write operations')
+    load.add_argument('--seed-bookings', type=int, default=200, help='existing bookings to confirm and edit')
+    load.add_argument('--database', help='empty database URL instead of temporary SQLite files (one pool size)')
+    load.add_argument('--seed', type=int, default=42)
+    load.set_defaults(run=bench_load)
+
+    args = parser.parse_args(argv)
+    print(json.dumps({'scenario': args.scenario, **args.run(args)}, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
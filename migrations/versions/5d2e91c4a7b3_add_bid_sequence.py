@@ -0,0 +1,30 @@
+"""add bid sequence
+
+Revision ID: 5d2e91c4a7b3
+Revises: 85b3447f0ba4
+Create Date: 2026-10-18 14:05:12.418530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e91c4a7b3'
+down_revision = '85b3447f0ba4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bid_sequence = op.create_table('bid_sequence',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('next_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Existing random BIDs are not tracked; the allocator retries on the rare clash
+    op.bulk_insert(bid_sequence, [{'name': 'booking', 'next_value': 0}])
+
+
+def downgrade():
+    op.drop_table('bid_sequence')
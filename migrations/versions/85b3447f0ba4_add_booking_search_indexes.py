@@ -0,0 +1,72 @@
+"""add booking search indexes
+
+Revision ID: 85b3447f0ba4
+Revises: 148eac57d8e3
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '85b3447f0ba4'
+down_revision = '148eac57d8e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_digits', sa.String(length=20), nullable=True))
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("UPDATE booking SET phone_digits = regexp_replace(phone, '[^0-9]', '', 'g')")
+        # Trigram indexes serve substring ILIKE/LIKE; text_pattern_ops serves BID prefixes
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_booking_client_name_trgm ON booking USING gin (lower(client_name) gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_booking_phone_digits_trgm ON booking USING gin (phone_digits gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_booking_bid_prefix ON booking (bid text_pattern_ops)')
+    else:
+        rows = bind.execute(sa.text('SELECT id, phone FROM booking')).fetchall()
+        for booking_id, phone in rows:
+            bind.execute(sa.text('UPDATE booking SET phone_digits = :digits WHERE id = :id'),
+                         {'digits': re.sub(r'\D', '', phone or ''), 'id': booking_id})
+        with op.batch_alter_table('booking', schema=None) as batch_op:
+            batch_op.create_index('ix_booking_phone_digits', ['phone_digits'], unique=False)
+        if bind.dialect.name == 'sqlite':
+            # External-content FTS5 table kept in sync by triggers
+            op.execute("CREATE VIRTUAL TABLE booking_fts USING fts5(bid, client_name, phone_digits, content='booking', content_rowid='id')")
+            op.execute("""CREATE TRIGGER booking_fts_ai AFTER INSERT ON booking BEGIN
+                INSERT INTO booking_fts(rowid, bid, client_name, phone_digits) VALUES (new.id, new.bid, new.client_name, new.phone_digits);
+            END""")
+            op.execute("""CREATE TRIGGER booking_fts_ad AFTER DELETE ON booking BEGIN
+                INSERT INTO booking_fts(booking_fts, rowid, bid, client_name, phone_digits) VALUES ('delete', old.id, old.bid, old.client_name, old.phone_digits);
+            END""")
+            op.execute("""CREATE TRIGGER booking_fts_au AFTER UPDATE ON booking BEGIN
+                INSERT INTO booking_fts(booking_fts, rowid, bid, client_name, phone_digits) VALUES ('delete', old.id, old.bid, old.client_name, old.phone_digits);
+                INSERT INTO booking_fts(rowid, bid, client_name, phone_digits) VALUES (new.id, new.bid, new.client_name, new.phone_digits);
+            END""")
+            op.execute("INSERT INTO booking_fts(booking_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_booking_bid_prefix')
+        op.execute('DROP INDEX IF EXISTS ix_booking_phone_digits_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_booking_client_name_trgm')
+    else:
+        if bind.dialect.name == 'sqlite':
+            op.execute('DROP TRIGGER IF EXISTS booking_fts_au')
+            op.execute('DROP TRIGGER IF EXISTS booking_fts_ad')
+            op.execute('DROP TRIGGER IF EXISTS booking_fts_ai')
+            op.execute('DROP TABLE IF EXISTS booking_fts')
+        with op.batch_alter_table('booking', schema=None) as batch_op:
+            batch_op.drop_index('ix_booking_phone_digits')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('phone_digits')
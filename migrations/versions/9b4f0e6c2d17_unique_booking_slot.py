@@ -0,0 +1,42 @@
+"""unique booking slot
+
+Revision ID: 9b4f0e6c2d17
+Revises: 5d2e91c4a7b3
+Create Date: 2026-10-18 15:31:47.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f0e6c2d17'
+down_revision = '5d2e91c4a7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT hall_id, date, time_slot, COUNT(*) FROM booking '
+        'GROUP BY hall_id, date, time_slot HAVING COUNT(*) > 1')).fetchall()
+    if duplicates:
+        listed = ', '.join(f'hall {hall_id} {day} {slot} ({count}x)' for hall_id, day, slot, count in duplicates[:20])
+        raise RuntimeError(f'Resolve double-booked slots before upgrading: {listed}')
+
+    # The unique index leads with (hall_id, date), so the plain composite index is redundant
+    op.drop_index('ix_booking_hall_id_date', table_name='booking')
+    if op.get_bind().dialect.name == 'sqlite':
+        # A unique index serves ON CONFLICT just the same, and avoids batch
+        # mode's table copy, which would drop the search triggers
+        op.create_index('uq_booking_hall_date_slot', 'booking', ['hall_id', 'date', 'time_slot'], unique=True)
+    else:
+        op.create_unique_constraint('uq_booking_hall_date_slot', 'booking', ['hall_id', 'date', 'time_slot'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.drop_index('uq_booking_hall_date_slot', table_name='booking')
+    else:
+        op.drop_constraint('uq_booking_hall_date_slot', 'booking', type_='unique')
+    op.create_index('ix_booking_hall_id_date', 'booking', ['hall_id', 'date'], unique=False)
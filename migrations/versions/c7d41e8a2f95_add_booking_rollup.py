@@ -0,0 +1,48 @@
+"""add booking rollup
+
+Revision ID: c7d41e8a2f95
+Revises: 9b4f0e6c2d17
+Create Date: 2026-10-18 18:12:05.417390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d41e8a2f95'
+down_revision = '9b4f0e6c2d17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('booking_rollup',
+    sa.Column('hall_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('time_slot', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('advance_paid', sa.Float(), nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['hall_id'], ['hall.id'], ),
+    sa.PrimaryKeyConstraint('hall_id', 'year', 'month', 'time_slot', 'status')
+    )
+
+    # Fill it from the existing bookings; the app keeps it current from here on
+    booking = sa.table('booking', sa.column('hall_id'), sa.column('date', sa.Date), sa.column('time_slot'),
+                       sa.column('status'), sa.column('total'), sa.column('advance_paid'), sa.column('balance'))
+    rollup = sa.table('booking_rollup', *(sa.column(name) for name in (
+        'hall_id', 'year', 'month', 'time_slot', 'status', 'bookings', 'total', 'advance_paid', 'balance')))
+    year, month = sa.extract('year', booking.c.date), sa.extract('month', booking.c.date)
+    status = sa.func.coalesce(booking.c.status, 'pending')
+    op.execute(rollup.insert().from_select([c.name for c in rollup.c], sa.select(
+        booking.c.hall_id, year, month, booking.c.time_slot, status, sa.func.count(),
+        sa.func.coalesce(sa.func.sum(booking.c.total), 0.0), sa.func.coalesce(sa.func.sum(booking.c.advance_paid), 0.0),
+        sa.func.coalesce(sa.func.sum(booking.c.balance), 0.0)).group_by(booking.c.hall_id, year, month, booking.c.time_slot, status)))
+
+
+def downgrade():
+    op.drop_table('booking_rollup')
@@ -0,0 +1,32 @@
+"""add data version
+
+Revision ID: e2a9b7c31d48
+Revises: c7d41e8a2f95
+Create Date: 2026-10-18 20:46:33.518274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9b7c31d48'
+down_revision = 'c7d41e8a2f95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Starts empty: a month without a row is at version 0 until its first change
+    op.create_table('data_version',
+    sa.Column('hall_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('hall_id', 'year', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,27 @@
+"""add user session version
+
+Revision ID: f3c8a1d5b6e2
+Revises: e2a9b7c31d48
+Create Date: 2026-10-18 23:12:05.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d5b6e2'
+down_revision = 'e2a9b7c31d48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing sessions carry no cached identity, so 0 invalidates nothing
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('session_version')
@@ -0,0 +1,35 @@
+import sys
+import argparse
+from app.dbaccess import connection, create_script_app
+from app.rollups import rebuild, reconcile
+
+def rebuild_rollups():
+    app = create_script_app()
+    # Replaced in one transaction, so reports never see a half-built table
+    with app.app_context(), connection(begin=True) as (conn, timer):
+        rows = rebuild(conn)
+    print(f"Rebuilt booking_rollup: {rows} rows ({timer})")
+
+def check_rollups():
+    app = create_script_app()
+    with app.app_context(), connection() as (conn, timer):
+        mismatches = reconcile(conn)
+    for key, expected, stored in mismatches:
+        hall_id, year, month, time_slot, status = key
+        print(f"  hall {hall_id} {year}-{month:02d} {time_slot} {status}: "
+              f"expected {expected[0]} bookings / {expected[1]:.2f} total, rollup has {stored[0]} / {stored[1]:.2f}")
+    if mismatches:
+        print(f"booking_rollup is out of step in {len(mismatches)} rows; run `python rollups.py rebuild` ({timer})")
+        return False
+    print(f"booking_rollup matches the bookings ({timer})")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Maintain the booking_rollup table behind the finance report.')
+    parser.add_argument('command', choices=['rebuild', 'check'],
+                        help='rebuild: recompute it from the bookings; check: compare it with them (exit status 1 on differences)')
+    args = parser.parse_args()
+    if args.command == 'rebuild':
+        rebuild_rollups()
+    elif not check_rollups():
+        sys.exit(1)